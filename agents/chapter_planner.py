@@ -0,0 +1,113 @@
+# =============================
+# agents/chapter_planner.py
+# =============================
+from __future__ import annotations
+import json
+import orjson
+from typing import Any, Dict, Optional
+from llm_base import LLMBase, PipelineContext
+from prompt_templates import render
+from agents.director_agent import DirectorAgent, DIRECTOR_DECISION_SCHEMA
+from agents.lore_assistant import LoreAssistant, MEMORY_CARDS_SCHEMA
+from agents.outline_planner import OutlinePlanner, OUTLINE_SCHEMA
+
+# 三个 Agent 的输出融合为一个多输出 Schema
+CHAPTER_PLAN_SCHEMA: Dict[str, Any] = {
+    "name": "ChapterPlan",
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "properties": {
+            "director": DIRECTOR_DECISION_SCHEMA["schema"],
+            "cards": MEMORY_CARDS_SCHEMA["schema"],
+            "outline": OUTLINE_SCHEMA["schema"],
+        },
+        "required": ["director", "cards", "outline"],
+    },
+}
+
+
+class ChapterPlanner(LLMBase):
+    """把导演决策 → 设定记忆卡 → 章/节纲要融合为一次多输出调用。
+    三个 Agent 共享约 95% 的输入（meta+worldview+characters+conflicts）；
+    融合后同样的上下文只 prefill 一次，网络往返从 3 次降为 1 次。
+    保留原有三个 Agent 类，Pipeline 可按需回退到逐个调用模式。
+    """
+
+    # 三段原 SYSTEM 按角色拼接，并约定内部推理顺序
+    SYSTEM = (
+        "你将在一次调用中依次完成三个角色的工作，分别输出到对应的 JSON 字段：\n"
+        "\n## 角色一：章节导演（输出到 director）\n" + DirectorAgent.SYSTEM +
+        "\n## 角色二：设定助理（输出到 cards）\n" + LoreAssistant.SYSTEM +
+        "\n## 角色三：纲要师（输出到 outline）\n" + OutlinePlanner.SYSTEM +
+        "\n## 总体约束\n"
+        "- cards 必须基于 director 的决策；outline 必须基于 director 与 cards。\n"
+        "- 按 director → cards → outline 的顺序推理，一次性输出三者。\n"
+    )
+
+    USER_TEMPLATE_VOLATILE = """
+## Meta（关键，必须遵循）
+{meta_json}
+
+## 上一章摘要（可空）
+{prev_summary}
+
+## 上一章更新（可空）
+{prev_update}
+
+请基于以上，依次产出 director / cards / outline。
+"""
+
+    def build_request(self, *, meta: Dict[str, Any], worldview: Dict[str, Any],
+            characters: Optional[Dict[str, Any]], conflicts: Optional[Dict[str, Any]],
+            prev_chapter_summary: str = "", chapter_index: int = 1,
+            update_json_path: Optional[str] = None,
+            meta_json: Optional[str] = None, worldview_json: Optional[str] = None,
+            chars_conflicts_json: Optional[str] = None,
+            context: Optional[PipelineContext] = None) -> Dict[str, Any]:
+        """组装融合规划调用的完整请求参数。
+        在线路径（run → call_structured_json）与离线路径
+        （ChapterBootstrapPipeline.schedule → batch_enqueue）共用。
+        """
+        prev_update = LoreAssistant.load_prev_update(update_json_path)
+        if context is not None:
+            # 共享上下文块：与逐个调用模式字节一致，利于前缀缓存
+            meta_json = meta_json or context.meta_json
+            stable = context.shared_block
+        else:
+            meta_json = meta_json or orjson.dumps(meta).decode()
+            world_json = worldview_json or orjson.dumps(worldview).decode()
+            chars_conf = chars_conflicts_json or orjson.dumps({
+                "characters": characters or {},
+                "conflicts": conflicts or {}
+            }).decode()
+            stable = render(DirectorAgent.USER_TEMPLATE_STABLE,
+                            worldview_json=world_json,
+                            chars_conflicts=chars_conf)
+        if chapter_index == 1:
+            # 第一章沿用导演的特殊要求（不含 Meta 段，易变尾部已渲染过 Meta），
+            # 再补 cards/outline 的产出指令
+            volatile = DirectorAgent.USER_TEMPLATE_CH1_REQUIREMENTS
+            volatile += render(self.USER_TEMPLATE_VOLATILE,
+                               meta_json=meta_json,
+                               prev_summary="",
+                               prev_update=orjson.dumps(prev_update).decode())
+        else:
+            volatile = render(self.USER_TEMPLATE_VOLATILE,
+                              meta_json=meta_json,
+                              prev_summary=prev_chapter_summary or "",
+                              prev_update=orjson.dumps(prev_update).decode())
+        up = [
+            {"text": stable, "cache_control": {"type": "ephemeral"}},
+            {"text": volatile},
+        ]
+        return {
+            "model": self.STRONG_TEXT_MODEL,
+            "system_prompt": self.SYSTEM,
+            "user_prompt": up,
+            "json_schema": CHAPTER_PLAN_SCHEMA,
+            "temperature": 0.55,  # 三个原温度（0.6/0.4/0.55）的中位数
+        }
+
+    def run(self, **kwargs) -> Dict[str, Any]:
+        return self.call_structured_json(**self.build_request(**kwargs))
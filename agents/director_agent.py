@@ -1,7 +1,9 @@
 from __future__ import annotations
 import json
+import orjson
 from typing import Any, Dict, Optional
-from llm_base import LLMBase
+from llm_base import LLMBase, PipelineContext, project_fields
+from prompt_templates import render
 
 DIRECTOR_DECISION_SCHEMA: Dict[str, Any] = {
     "name": "DirectorDecision",
@@ -21,6 +23,13 @@ DIRECTOR_DECISION_SCHEMA: Dict[str, Any] = {
 }
 
 class DirectorAgent(LLMBase):
+    # 导演决策只需要世界观中与基调/约束相关的字段；其余 facet 不参与决策
+    WORLDVIEW_FIELDS = [
+        "hard_constraints", "consistency_rules", "tone", "genre_tone",
+        "genre_axes", "era", "era_power_level", "history", "factions",
+        "open_questions",
+    ]
+
     SYSTEM = """
 你是章节导演。目标：决定本章的写作手法、视角策略、情绪曲线与信息滴灌预算，并明确冲突入口。
 必须遵守：
@@ -29,56 +38,79 @@ class DirectorAgent(LLMBase):
 3) 输出字段必须符合 DirectorDecision JSON Schema。
 """
 
+    # 稳定前缀：跨章节不变的大块素材（世界观/角色矛盾）放最前，供前缀缓存命中
+    USER_TEMPLATE_STABLE = """
+## 世界观 Final（长文，按需参考）
+{worldview_json}
+
+## 角色与矛盾（长文，按需参考）
+{chars_conflicts}
+"""
+
+    # 易变尾部：每章不同的小块参数放最后，避免打断缓存前缀
     USER_TEMPLATE_GENERIC = """
 ## Meta（关键，必须遵循）
 {meta_json}
 
-## 输入素材
-- 上一章摘要（可空）：\n{prev_summary}\n
-- 世界观 Final（长文，按需参考）：\n{worldview_json}\n
-- 角色与矛盾（长文，按需参考）：\n{chars_conflicts}\n
+## 上一章摘要（可空）
+{prev_summary}
+
 请基于以上，产出本章的导演决策。
 """
 
-    # 第一章的特殊提示词：必须向读者建立世界背景的最低可理解面
-    USER_TEMPLATE_CH1 = """
-## Meta（关键，必须遵循）
-{meta_json}
-
+    # 第一章的特殊要求（不含 Meta 段）：ChapterPlanner 的易变尾部自带 Meta，
+    # 拼接时直接复用这一段，避免同一条消息里渲染两份 Meta
+    USER_TEMPLATE_CH1_REQUIREMENTS = """
 你正在为“第一章”做导演决策。要求：
 1) 全量读取世界观与角色信息，判断读者理解所需的最低背景，并将此转化为 info_budget 建议（不过载）。
 2) 写作手法需兼顾引子：允许 in media res，但必须设计最低背景可推断路径。
 3) 明确冲突入口（conflict_focus），保证人物能动性驱动场景。
 4) 给出 3-6 条 notes，说明第一章在读者侧的“背景建立策略”。
-
-## 世界观 Final：\n{worldview_json}
-
-## 角色与矛盾总览：\n{chars_conflicts}
 """
 
+    # 第一章的特殊提示词：必须向读者建立世界背景的最低可理解面
+    USER_TEMPLATE_CH1 = """
+## Meta（关键，必须遵循）
+{meta_json}
+""" + USER_TEMPLATE_CH1_REQUIREMENTS
+
     def run(self, *, meta: Dict[str, Any], worldview: Dict[str, Any],
             characters: Optional[Dict[str, Any]], conflicts: Optional[Dict[str, Any]],
-            prev_chapter_summary: str = "", chapter_index: int = 1) -> Dict[str, Any]:
-        meta_json = json.dumps(meta, ensure_ascii=False, indent=2)
-        world_json = json.dumps(worldview, ensure_ascii=False, indent=2)
-        chars_conf = json.dumps({
-            "characters": characters or {},
-            "conflicts": conflicts or {}
-        }, ensure_ascii=False, indent=2)
-
+            prev_chapter_summary: str = "", chapter_index: int = 1,
+            meta_json: Optional[str] = None, worldview_json: Optional[str] = None,
+            chars_conflicts_json: Optional[str] = None,
+            context: Optional[PipelineContext] = None) -> Dict[str, Any]:
+        if context is not None:
+            # Pipeline 传入共享上下文：稳定前缀与其他 Agent 字节一致，命中前缀缓存
+            meta_json = meta_json or context.meta_json
+            stable = context.shared_block
+        else:
+            # 调用方（如 Pipeline）可传入已序列化字符串，避免对同一大 dict 反复 dumps
+            meta_json = meta_json or orjson.dumps(meta).decode()
+            # 投影命中时按需裁剪（覆盖传入的全量序列化）；未命中则退回全量
+            projected = project_fields(worldview, self.WORLDVIEW_FIELDS)
+            if projected is not worldview:
+                world_json = orjson.dumps(projected).decode()
+            else:
+                world_json = worldview_json or orjson.dumps(worldview).decode()
+            chars_conf = chars_conflicts_json or orjson.dumps({
+                "characters": characters or {},
+                "conflicts": conflicts or {}
+            }).decode()
+            # render = 预编译版 format：模板只切分一次，逐章渲染只做拼接
+            stable = render(self.USER_TEMPLATE_STABLE,
+                            worldview_json=world_json,
+                            chars_conflicts=chars_conf)
         if chapter_index == 1:
-            up = self.USER_TEMPLATE_CH1.format(
-                meta_json=meta_json,
-                worldview_json=world_json,
-                chars_conflicts=chars_conf
-            )
+            volatile = render(self.USER_TEMPLATE_CH1, meta_json=meta_json)
         else:
-            up = self.USER_TEMPLATE_GENERIC.format(
-                meta_json=meta_json,
-                prev_summary=prev_chapter_summary or "",
-                worldview_json=world_json,
-                chars_conflicts=chars_conf
-            )
+            volatile = render(self.USER_TEMPLATE_GENERIC,
+                              meta_json=meta_json,
+                              prev_summary=prev_chapter_summary or "")
+        up = [
+            {"text": stable, "cache_control": {"type": "ephemeral"}},
+            {"text": volatile},
+        ]
         decision = self.call_structured_json(
             model=self.STRONG_TEXT_MODEL,
             system_prompt=self.SYSTEM,
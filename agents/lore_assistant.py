@@ -3,8 +3,10 @@
 # =============================
 from __future__ import annotations
 import json, os
+import orjson
 from typing import Any, Dict, Optional
-from llm_base import LLMBase
+from llm_base import LLMBase, PipelineContext, project_fields
+from prompt_templates import render
 
 MEMORY_CARDS_SCHEMA: Dict[str, Any] = {
     "name": "MemoryCards",
@@ -22,6 +24,12 @@ MEMORY_CARDS_SCHEMA: Dict[str, Any] = {
 }
 
 class LoreAssistant(LLMBase):
+    # 记忆卡筛选所需：硬约束/术语/规则类字段；过滤在代码侧强制执行，不依赖模型自律
+    WORLDVIEW_FIELDS = [
+        "hard_constraints", "consistency_rules", "terminology", "glossary",
+        "facets", "rules", "history", "open_questions",
+    ]
+
     SYSTEM = """
 你是设定助理。任务：在极大设定中筛出“当章必需记忆卡”，避免信息过载。
 约束：
@@ -30,6 +38,14 @@ class LoreAssistant(LLMBase):
 - 若检测到上一章 update.json，则将可继承的变更摘要并入 prior_updates。
 """
 
+    # 稳定前缀：世界观/角色矛盾跨章节不变，置于最前以命中前缀缓存
+    USER_TEMPLATE_STABLE = """
+## 设定来源
+- 世界观：\n{worldview_json}
+- 角色与矛盾：\n{chars_conflicts}
+"""
+
+    # 易变尾部：每章不同的导演决策与增量更新放最后
     USER_TEMPLATE = """
 ## Meta（关键，必须遵循）
 {meta_json}
@@ -37,36 +53,58 @@ class LoreAssistant(LLMBase):
 ## 导演决策
 {director_json}
 
-## 设定来源
-- 世界观：\n{worldview_json}
-- 角色与矛盾：\n{chars_conflicts}
-- 上一章更新（可空）：\n{prev_update}
+## 上一章更新（可空）
+{prev_update}
 
 请返回 MemoryCards（严格遵循 Schema）。
 """
 
-    def run(self, *, meta: Dict[str, Any], director_decision: Dict[str, Any],
-            worldview: Dict[str, Any], characters: Optional[Dict[str, Any]], conflicts: Optional[Dict[str, Any]],
-            update_json_path: Optional[str]) -> Dict[str, Any]:
-        meta_json = json.dumps(meta, ensure_ascii=False, indent=2)
-        director_json = json.dumps(director_decision, ensure_ascii=False, indent=2)
-        world_json = json.dumps(worldview, ensure_ascii=False, indent=2)
-        chars_conf = json.dumps({"characters": characters or {}, "conflicts": conflicts or {}}, ensure_ascii=False, indent=2)
-
-        prev_update = {}
+    @staticmethod
+    def load_prev_update(update_json_path: Optional[str]) -> Dict[str, Any]:
+        """读取上一章 update.json（可空；损坏时返回警告占位）。"""
+        prev_update: Dict[str, Any] = {}
         if update_json_path and os.path.exists(update_json_path):
             try:
                 with open(update_json_path, "r", encoding="utf-8") as f:
                     prev_update = json.load(f)
             except Exception:
                 prev_update = {"_warn": "failed_to_load_update_json"}
-        prompt = self.USER_TEMPLATE.format(
-            meta_json=meta_json,
-            director_json=director_json,
-            worldview_json=world_json,
-            chars_conflicts=chars_conf,
-            prev_update=json.dumps(prev_update, ensure_ascii=False, indent=2)
-        )
+        return prev_update
+
+    def run(self, *, meta: Dict[str, Any], director_decision: Dict[str, Any],
+            worldview: Dict[str, Any], characters: Optional[Dict[str, Any]], conflicts: Optional[Dict[str, Any]],
+            update_json_path: Optional[str],
+            meta_json: Optional[str] = None, worldview_json: Optional[str] = None,
+            chars_conflicts_json: Optional[str] = None,
+            context: Optional[PipelineContext] = None) -> Dict[str, Any]:
+        director_json = orjson.dumps(director_decision).decode()
+        if context is not None:
+            # Pipeline 传入共享上下文：稳定前缀与 DirectorAgent 字节一致，命中前缀缓存
+            meta_json = meta_json or context.meta_json
+            stable = context.shared_block
+        else:
+            # 调用方（如 Pipeline）可传入已序列化字符串，避免对同一大 dict 反复 dumps
+            meta_json = meta_json or orjson.dumps(meta).decode()
+            # 投影命中时按需裁剪（覆盖传入的全量序列化）；未命中则退回全量
+            projected = project_fields(worldview, self.WORLDVIEW_FIELDS)
+            if projected is not worldview:
+                world_json = orjson.dumps(projected).decode()
+            else:
+                world_json = worldview_json or orjson.dumps(worldview).decode()
+            chars_conf = chars_conflicts_json or orjson.dumps({"characters": characters or {}, "conflicts": conflicts or {}}).decode()
+            stable = render(self.USER_TEMPLATE_STABLE,
+                            worldview_json=world_json,
+                            chars_conflicts=chars_conf)
+
+        prev_update = self.load_prev_update(update_json_path)
+        volatile = render(self.USER_TEMPLATE,
+                          meta_json=meta_json,
+                          director_json=director_json,
+                          prev_update=orjson.dumps(prev_update).decode())
+        prompt = [
+            {"text": stable, "cache_control": {"type": "ephemeral"}},
+            {"text": volatile},
+        ]
         cards = self.call_structured_json(
             model=self.STRONG_TEXT_MODEL,
             system_prompt=self.SYSTEM,
@@ -1,7 +1,9 @@
 from __future__ import annotations
 import json
-from typing import Any, Dict, List
-from llm_base import LLMBase
+import orjson
+from typing import Any, Dict, List, Optional
+from llm_base import LLMBase, PipelineContext
+from prompt_templates import render
 
 OUTLINE_SCHEMA: Dict[str, Any] = {
     "name": "ChapterOutline",
@@ -55,12 +57,15 @@ class OutlinePlanner(LLMBase):
 请输出 ChapterOutline（严格遵循 Schema）。
 """
 
-    def run(self, *, meta: Dict[str, Any], director_decision: Dict[str, Any], memory_cards: Dict[str, Any]) -> Dict[str, Any]:
-        up = self.USER_TEMPLATE.format(
-            meta_json=json.dumps(meta, ensure_ascii=False, indent=2),
-            director_json=json.dumps(director_decision, ensure_ascii=False, indent=2),
-            cards_json=json.dumps(memory_cards, ensure_ascii=False, indent=2)
-        )
+    def run(self, *, meta: Dict[str, Any], director_decision: Dict[str, Any], memory_cards: Dict[str, Any],
+            meta_json: Optional[str] = None,
+            context: Optional[PipelineContext] = None) -> Dict[str, Any]:
+        if context is not None:
+            meta_json = meta_json or context.meta_json
+        up = render(self.USER_TEMPLATE,
+                    meta_json=meta_json or orjson.dumps(meta).decode(),
+                    director_json=orjson.dumps(director_decision).decode(),
+                    cards_json=orjson.dumps(memory_cards).decode())
         outline = self.call_structured_json(
             model=self.STRONG_TEXT_MODEL,
             system_prompt=self.SYSTEM,
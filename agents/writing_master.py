@@ -1,14 +1,36 @@
+from collections import OrderedDict
+import re
 from llm_base import LLMBase
 
 class WritingMaster(LLMBase):
+    # 近重复提示词缓存容量：一次创作会话内反复打磨同一场景时命中
+    _CACHE_MAX = 1000
+
     def __init__(self, env_path: str):
         super().__init__(env_path)
+        # 按归一化提示词缓存建议（类级共享，LRU 有界）：
+        # 同一场景迭代时提示词往往只差空白/标点，归一化后即可命中，
+        # 省掉整个 LLM 往返
+        if not hasattr(type(self), "_guidance_cache"):
+            type(self)._guidance_cache = OrderedDict()
 
 
     SYSTEM = """你是一名资深的写作指导专家，专注于提升各类写作作品的质量，包括小说、剧本、散文等。你的任务是根据用户提供的写作内容，给予具体且实用的建议
 不要包含任何与写作无关的内容，不用提示用户追问，仅思考。
 """
-    def provide_guidance(self,prompt: str) -> str:
+
+    @staticmethod
+    def _normalize_prompt(prompt: str) -> str:
+        """折叠空白、去首尾空白：吸收近重复提示词的表面差异。"""
+        return re.sub(r"\s+", " ", prompt).strip()
+
+    def provide_guidance(self, prompt: str) -> str:
+        cache = type(self)._guidance_cache
+        key = self._normalize_prompt(prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            cache.move_to_end(key)
+            return cached
         response = self.call_structured_json(
             model=self.STRONG_TEXT_MODEL,
             system_prompt=self.SYSTEM,
@@ -28,4 +50,8 @@ class WritingMaster(LLMBase):
             },
             temperature=0.7,
         )
-        return response["guidance"]
\ No newline at end of file
+        guidance = response["guidance"]
+        cache[key] = guidance
+        if len(cache) > self._CACHE_MAX:
+            cache.popitem(last=False)
+        return guidance
@@ -8,15 +8,21 @@ CharacterGenerator
 - 写作语言：中文
 """
 
+import asyncio
 import os
-import json
-import time
-import random
+import secrets
+
+import orjson
+import fastjsonschema
 from typing import Any, Dict, List, Optional
 from pathlib import Path
 
-from openai import OpenAI
-from dotenv import load_dotenv
+import config
+import llm_cache
+import llm_client
+import schema_cache
+from streaming_json import ArrayElementScanner
+from prompt_templates import render
 
 class CharacterGenerator:
     def __init__(
@@ -28,26 +34,27 @@ class CharacterGenerator:
         num_secondary: int = 8,
         seed: Optional[int] = None,
     ):
-        load_dotenv(env_path)
-
+        self.env_path = env_path
         self.meta = meta
         self.worldview = worldview
         self.num_primary = num_primary
         self.num_secondary = num_secondary
-        self.seed = seed if seed is not None else int(time.time() * 1000) ^ random.getrandbits(32)
+        # secrets.randbits 不触碰全局 random 状态；seed 只用于 API 侧复现，不再喂给本地 RNG
+        self.seed = seed if seed is not None else secrets.randbits(64)
 
-        self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("API_KEY")
-        self.OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or os.getenv("BASE_URL")
-        self.STRONG_TEXT_MODEL = os.getenv("STRONG_TEXT_MODEL")
-        self.WEAK_TEXT_MODEL   = os.getenv("WEAK_TEXT_MODEL")
+        # .env 只加载一次（get_config 按路径缓存）
+        cfg = config.get_config(env_path)
+        self.OPENAI_API_KEY = cfg.api_key
+        self.OPENAI_BASE_URL = cfg.base_url
+        self.STRONG_TEXT_MODEL = cfg.strong_model
+        self.WEAK_TEXT_MODEL   = cfg.weak_model
 
-        if not self.OPENAI_API_KEY:
-            raise RuntimeError("Missing OPENAI_API_KEY (or API_KEY) in .env")
-
-        self.client = OpenAI(
-            api_key=self.OPENAI_API_KEY,
-            base_url=self.OPENAI_BASE_URL if self.OPENAI_BASE_URL else None,
-        )
+        # meta/worldview 在实例生命周期内不变，只序列化一次供各提示词复用
+        # （紧凑 JSON：模型不需要缩进，省下的空白即省下的输入 token）
+        self._meta_json = orjson.dumps(self.meta).decode()
+        self._worldview_json = orjson.dumps(self.worldview).decode()
+        self._worldview_and_meta_json = orjson.dumps(
+            {"worldview": self.worldview, "meta": self.meta}).decode()
 
         # ------------ Prompts ------------
         self.SYSTEM_PROMPT = """你是一名“人物设定工程师”。你将根据提供的世界观与写作目标，自由而一致地生成主要/次要角色。
@@ -161,7 +168,7 @@ class CharacterGenerator:
                                     "minItems": 3,
                                     "items": {
                                         "type": "object",
-                                        "additionalProperties": True,
+                                        "additionalProperties": False,  # 收紧：自由字段只会放大输出 token
                                         "properties": {
                                             "type": {"type": "string", "enum": ["episodic", "semantic", "procedural", "flashbulb", "dreamlike"]},
                                             "content": {"type": "string"},
@@ -178,7 +185,7 @@ class CharacterGenerator:
                                     "minItems": 3,
                                     "items": {
                                         "type": "object",
-                                        "additionalProperties": True,
+                                        "additionalProperties": False,
                                         "properties": {
                                             "when": {"type": "string"},           # 与世界观历法/时代描述相容的时间线文本
                                             "event": {"type": "string"},
@@ -195,7 +202,7 @@ class CharacterGenerator:
                                     "type": "array",
                                     "items": {
                                         "type": "object",
-                                        "additionalProperties": True,
+                                        "additionalProperties": False,
                                         "properties": {
                                             "target_id": {"type": "string"},   # 指向其他角色 id（允许先行引用）
                                             "relation": {"type": "string"},
@@ -205,7 +212,7 @@ class CharacterGenerator:
                                 },
                                 "goals": {
                                     "type": "object",
-                                    "additionalProperties": True,
+                                    "additionalProperties": False,
                                     "properties": {
                                         "short_term": {"type": "array", "items": {"type": "string"}},
                                         "mid_term": {"type": "array", "items": {"type": "string"}},
@@ -214,7 +221,7 @@ class CharacterGenerator:
                                 },
                                 "traits_skills_assets": {
                                     "type": "object",
-                                    "additionalProperties": True,
+                                    "additionalProperties": False,
                                     "properties": {
                                         "traits": {"type": "array", "items": {"type": "string"}},
                                         "skills": {"type": "array", "items": {"type": "string"}},
@@ -269,16 +276,40 @@ class CharacterGenerator:
             }
         }
 
+        # 本地预编译校验器：fastjsonschema 将 Schema 代码生成为直线 Python 函数，
+        # 微秒级完成校验，替代“原样返回”式的 LLM 往返；
+        # 生成的源码按内容哈希落盘复用，跨进程启动免重复编译
+        self._validate_character_set = schema_cache.compile_cached(self.CHARACTER_SET_SCHEMA["schema"])
+        # 单角色校验器：流式生成过程中对每个闭合的 characters[i] 即时校验
+        self._validate_character_item = schema_cache.compile_cached(
+            self.CHARACTER_SET_SCHEMA["schema"]["properties"]["characters"]["items"])
+
     # ---------------- Core LLM Call ----------------
-    def _call_structured_json(
+    async def _call_structured_json(
         self,
         model: str,
         system_prompt: str,
         user_prompt: str,
         json_schema: Dict[str, Any],
-        temperature: float
+        temperature: float,
+        cacheable: bool = False,
+        scanner: Optional[ArrayElementScanner] = None,
+        seed: Optional[int] = None
     ) -> Dict[str, Any]:
-        resp = self.client.responses.create(
+        # 确定性调用（temperature==0）或显式声明可缓存时，先查响应缓存
+        cache_key = None
+        if cacheable or temperature == 0.0:
+            cache_key = llm_cache.cache_key(model, temperature, system_prompt, user_prompt, json_schema)
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        # 流式接收：文本片段一边到达一边喂给扫描器，使本地校验与网络传输重叠；
+        # 扫描器回调抛异常即尽早中止，不必等整个响应生成完
+        extra: Dict[str, Any] = {}
+        if seed is not None:
+            # 确定性种子交给 API 侧（extra_body 透传），本地不再 random.seed
+            extra["extra_body"] = {"seed": seed}
+        async with self.client.responses.stream(
             model=model,
             temperature=temperature,
             input=[
@@ -293,83 +324,134 @@ class CharacterGenerator:
                     "schema": json_schema["schema"],
                 }
             },
-        )
-        return json.loads(resp.output_text)
+            **extra,
+        ) as stream:
+            async for event in stream:
+                if scanner is not None and event.type == "response.output_text.delta":
+                    scanner.feed(event.delta)
+            resp = await stream.get_final_response()
+        output = orjson.loads(resp.output_text)
+        if cache_key is not None:
+            llm_cache.put(cache_key, output)
+        return output
+
+    @property
+    def client(self):
+        # 异步客户端按当前事件循环懒取：run() 每次 asyncio.run 换新 loop，
+        # 连接池不能跨 loop 复用（见 llm_client.get_async_client）
+        return llm_client.get_async_client(self.env_path)
 
     # ---------------- Builders ----------------
     def _build_generation_user_prompt(self) -> str:
         # 将世界观和元数据按“原样”并列给出，便于模型引用；不做剪裁以减少信息丢失
-        worldview_and_meta = json.dumps(
-            {
-                "worldview": self.worldview,
-                "meta": self.meta
-            },
-            ensure_ascii=False,
-            indent=2
-        )
-        return self.USER_PROMPT_TEMPLATE.format(
-            worldview_and_meta=worldview_and_meta,
-            num_primary=self.num_primary,
-            num_secondary=self.num_secondary
-        )
+        return render(self.USER_PROMPT_TEMPLATE,
+                      worldview_and_meta=self._worldview_and_meta_json,
+                      num_primary=self.num_primary,
+                      num_secondary=self.num_secondary)
 
     def _build_review_user_prompt(self, characters_json: Dict[str, Any]) -> str:
-        return self.REVIEW_USER_TEMPLATE.format(
-            worldview_json=json.dumps(self.worldview, ensure_ascii=False, indent=2),
-            meta_json=json.dumps(self.meta, ensure_ascii=False, indent=2),
-            characters_json=json.dumps(characters_json, ensure_ascii=False, indent=2)
-        )
+        return render(self.REVIEW_USER_TEMPLATE,
+                      worldview_json=self._worldview_json,
+                      meta_json=self._meta_json,
+                      characters_json=orjson.dumps(characters_json).decode())
 
     # ---------------- Pipeline Steps ----------------
-    def generate_characters(self) -> Dict[str, Any]:
-        random.seed(self.seed)
+    async def generate_characters(self) -> Dict[str, Any]:
         uprompt = self._build_generation_user_prompt()
-        draft = self._call_structured_json(
-            model=self.STRONG_TEXT_MODEL,        # 创作用强模型
-            system_prompt=self.SYSTEM_PROMPT,
-            user_prompt=uprompt,
-            json_schema=self.CHARACTER_SET_SCHEMA,
-            temperature=0.95
-        )
+        # 每个角色刚闭合就即时校验：坏输出在流中途即失败，不用等全部生成
+        scanner = ArrayElementScanner("characters", self._validate_character_item)
+        try:
+            draft = await self._call_structured_json(
+                model=self.STRONG_TEXT_MODEL,        # 创作用强模型
+                system_prompt=self.SYSTEM_PROMPT,
+                user_prompt=uprompt,
+                json_schema=self.CHARACTER_SET_SCHEMA,
+                temperature=0.95,
+                scanner=scanner,
+                seed=self.seed
+            )
+        except fastjsonschema.JsonSchemaException:
+            # strict=False 下偶发的漏键/多键属可修复漂移，不应让整次运行崩掉：
+            # 去掉流中预检重发一次，结构问题留给 final_schema_check 的修复路径
+            draft = await self._call_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt=self.SYSTEM_PROMPT,
+                user_prompt=uprompt,
+                json_schema=self.CHARACTER_SET_SCHEMA,
+                temperature=0.95,
+                seed=self.seed
+            )
         # 若模型未填 counts，则补上（容错）
         if "counts" not in draft:
             draft["counts"] = {"primary": self.num_primary, "secondary": self.num_secondary}
         return draft
 
-    def review_and_revise(self, draft_characters: Dict[str, Any]) -> Dict[str, Any]:
+    async def review_and_revise(self, draft_characters: Dict[str, Any]) -> Dict[str, Any]:
         uprompt = self._build_review_user_prompt(draft_characters)
-        review = self._call_structured_json(
-            model=self.STRONG_TEXT_MODEL,
-            system_prompt=self.REVIEW_SYSTEM,
-            user_prompt=uprompt,
-            json_schema=self.REVIEW_SCHEMA,
-            temperature=0.4
-        )
+        # 修订稿里的每个角色同样走预编译校验器做流中预检
+        # （扫描器锚定 "characters" 键，即 revised_characters 下的角色数组）
+        scanner = ArrayElementScanner("characters", self._validate_character_item)
+        try:
+            review = await self._call_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt=self.REVIEW_SYSTEM,
+                user_prompt=uprompt,
+                json_schema=self.REVIEW_SCHEMA,
+                temperature=0.4,
+                scanner=scanner
+            )
+        except fastjsonschema.JsonSchemaException as e:
+            # 修订稿流中校验失败：立即中止（省掉剩余生成），放弃修订退回草稿
+            return {"issues": [f"review_revision_failed_schema_check: {e}"], "improvements": []}
         return review
 
-    def final_schema_check(self, characters: Dict[str, Any]) -> Dict[str, Any]:
-        # 做一次结构校验（原样返回）
-        checked = self._call_structured_json(
-            model=self.WEAK_TEXT_MODEL,
-            system_prompt="请把以下 JSON 原样返回（用于角色集合 Schema 校验）。",
-            user_prompt=json.dumps(characters, ensure_ascii=False),
-            json_schema=self.CHARACTER_SET_SCHEMA,
-            temperature=0.0
-        )
-        return checked
+    async def final_schema_check(self, characters: Dict[str, Any]) -> Dict[str, Any]:
+        # 调试开关：CHEKHOV_SKIP_ECHO_VALIDATION=0 时恢复旧的 LLM 回显校验
+        # （把 JSON 发给弱模型请其按 Schema 修正后原样返回），用于对拍本地校验器；
+        # 默认走本地路径，不付一次往返的序列化/网络开销
+        if os.getenv("CHEKHOV_SKIP_ECHO_VALIDATION", "1") == "0":
+            return await self._call_structured_json(
+                model=self.WEAK_TEXT_MODEL,
+                system_prompt="请检查以下角色集合 JSON 是否符合 CharacterSet Schema；符合则原样返回，不符合则修正后返回。仅输出 JSON。",
+                user_prompt=orjson.dumps(characters).decode(),
+                json_schema=self.CHARACTER_SET_SCHEMA,
+                temperature=0.0,
+                cacheable=True
+            )
+        # 本地编译校验替代“原样返回”的 LLM 往返；通过则原样返回
+        try:
+            self._validate_character_set(characters)
+            return characters
+        except fastjsonschema.JsonSchemaException as e:
+            # 校验失败才退回一次强模型修复（把错误信息嵌入提示词）
+            repaired = await self._call_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt="以下角色集合 JSON 未通过 CharacterSet Schema 校验。请在尽量保留原内容的前提下修复结构问题，仅输出修复后的 JSON。",
+                user_prompt=f"【校验错误】{e}\n\n【待修复 JSON】\n{orjson.dumps(characters).decode()}",
+                json_schema=self.CHARACTER_SET_SCHEMA,
+                temperature=0.0,
+                cacheable=True
+            )
+            return repaired
 
     # ---------------- Public API ----------------
-    def run(self) -> Dict[str, Any]:
+    async def run_async(self) -> Dict[str, Any]:
         """
         流程：
         1) 生成角色草稿（主要/次要、记忆、时间线、关系、目标等）
-        2) 进行一次一致性审阅并得到修订稿
-        3) 最终结果通过 Schema 校验后返回
+        2) 审阅与草稿的 Schema 校验并发执行（两者都只依赖草稿）
+        3) 若审阅产出修订稿，再补一次 Schema 校验；否则直接用已校验的草稿
         """
-        draft_characters = self.generate_characters()
-        review = self.review_and_revise(draft_characters)
+        draft_characters = await self.generate_characters()
+        review, checked_draft = await asyncio.gather(
+            self.review_and_revise(draft_characters),
+            self.final_schema_check(draft_characters),
+        )
         final_characters = review.get("revised_characters", draft_characters)
-        final_characters = self.final_schema_check(final_characters)
+        if final_characters is draft_characters:
+            final_characters = checked_draft
+        else:
+            final_characters = await self.final_schema_check(final_characters)
 
         return {
             "seed": self.seed,
@@ -382,3 +464,7 @@ class CharacterGenerator:
             "final_characters": final_characters
         }
 
+    def run(self) -> Dict[str, Any]:
+        """同步入口：保持原有调用方式不变。"""
+        return asyncio.run(self.run_async())
+
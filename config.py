@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""进程级配置：
+- .env 每个路径只解析一次（lru_cache），替代各生成器/Agent 里
+  重复的 load_dotenv + 多次 os.getenv 轮询
+- 冻结 dataclass：配置在进程内不可变，实例化再多 Agent 也零额外开销
+"""
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Config:
+    api_key: str
+    base_url: Optional[str]
+    strong_model: str
+    weak_model: str
+
+
+@lru_cache(maxsize=None)
+def get_config(env_path: str) -> Config:
+    """按 env_path 缓存的配置读取；缺 API Key 时立即报错。"""
+    load_dotenv(env_path)
+    api_key = os.getenv("OPENAI_API_KEY") or os.getenv("API_KEY")
+    if not api_key:
+        raise RuntimeError("Missing OPENAI_API_KEY (or API_KEY) in .env")
+    return Config(
+        api_key=api_key,
+        base_url=os.getenv("OPENAI_BASE_URL") or os.getenv("BASE_URL"),
+        strong_model=os.getenv("STRONG_TEXT_MODEL", "gpt-5"),
+        weak_model=os.getenv("WEAK_TEXT_MODEL", "gpt-5-mini"),
+    )
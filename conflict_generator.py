@@ -12,15 +12,60 @@ ConflictGenerator
     3) 主要角色之间至少存在一种冲突/竞争/阻断关系
 """
 
+import asyncio
+import hashlib
 import os
-import json
+from collections import Counter
+from itertools import combinations
 import time
 import random
 from typing import Any, Dict, Optional, List
 from pathlib import Path
 
-from dotenv import load_dotenv
-from openai import OpenAI
+import fastjsonschema
+import orjson
+import tenacity
+
+import schema_cache
+from prompt_templates import render
+from streaming_json import ArrayElementScanner
+
+# orjson 在嵌套 dict 上比 stdlib json 快数倍；统一经这两个助手进出
+def _dumps(obj: Any, indent: bool = False) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+
+
+_loads = orjson.loads
+
+# openai 及其依赖树（httpx/pydantic）在首次用到时才导入，
+# 仅 import 本模块（如 CLI help、测试收集）时不付 ~300ms 冷启动成本
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """可重试的瞬时故障：限流 / 连接抖动 / 服务端 5xx。"""
+    import openai
+    return isinstance(exc, (openai.RateLimitError, openai.APIConnectionError,
+                            openai.InternalServerError))
+
+
+def _retry_wait(retry_state: "tenacity.RetryCallState") -> float:
+    """指数退避+抖动；429 带 Retry-After 头时至少等满服务端要求的时长。"""
+    import openai
+    base = tenacity.wait_exponential_jitter(initial=1, max=30)(retry_state)
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exc, openai.RateLimitError):
+        try:
+            retry_after = float(exc.response.headers.get("retry-after") or 0)
+            return max(base, retry_after)
+        except Exception:
+            pass
+    return base
+
+
+def _log_retry(retry_state: "tenacity.RetryCallState") -> None:
+    # 打出重试次数，上层可据此决定是否降级到 WEAK_TEXT_MODEL
+    print(f"[conflict_generator] LLM 调用第 {retry_state.attempt_number} 次失败，"
+          f"{retry_state.next_action.sleep:.1f}s 后重试")
 
 
 class ConflictGenerator:
@@ -30,24 +75,39 @@ class ConflictGenerator:
         worldview: Dict[str, Any],
         characters: Dict[str, Any],
         seed: Optional[int] = None,
+        cache_dir: str = ".cache/conflicts",
+        use_cache: bool = True,
     ):
-        load_dotenv(env_path)
-
         self.worldview = worldview
         self.characters = characters
         self.seed = seed if seed is not None else int(time.time() * 1000) ^ random.getrandbits(32)
-
-        self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("API_KEY")
-        self.OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or os.getenv("BASE_URL")
-        self.STRONG_TEXT_MODEL = os.getenv("STRONG_TEXT_MODEL", "gpt-5")
-        self.WEAK_TEXT_MODEL   = os.getenv("WEAK_TEXT_MODEL", "gpt-5-mini")
-
-        if not self.OPENAI_API_KEY:
-            raise RuntimeError("Missing OPENAI_API_KEY (or API_KEY) in .env")
-
-        self.client = OpenAI(
-            api_key=self.OPENAI_API_KEY,
-            base_url=self.OPENAI_BASE_URL if self.OPENAI_BASE_URL else None,
+        # 实例私有 RNG：并发 fan-out 多个生成器时互不干扰全局随机状态
+        self._rng = random.Random(self.seed)
+
+        import config
+        import llm_client
+        cfg = config.get_config(env_path)
+        self.OPENAI_API_KEY = cfg.api_key
+        self.OPENAI_BASE_URL = cfg.base_url
+        self.STRONG_TEXT_MODEL = cfg.strong_model
+        self.WEAK_TEXT_MODEL   = cfg.weak_model
+
+        self.env_path = env_path
+
+        # 输入在 __init__ 之后不再变化：世界观/角色卡只序列化一次，
+        # 三处提示词构建（生成/审阅/校验）共享同一字符串
+        self._characters_payload = self.characters.get("final_characters", self.characters)
+        # 紧凑 JSON：缩进的每个空白字节都是输入 token，模型并不需要缩进
+        self._worldview_json = _dumps(self.worldview)
+        self._characters_full_json = _dumps(self._characters_payload)
+        self._actors_index = self._extract_actor_index()
+
+        # 固定上下文前缀：世界观+角色卡置于 system 最前，三次调用字节一致，
+        # 服务端前缀缓存在第 2/3 次调用直接命中，免去重复 prefill
+        self._context_prefix = (
+            "【固定上下文】\n"
+            "## 世界观\n" + self._worldview_json + "\n"
+            "## 角色卡\n" + self._characters_full_json + "\n\n"
         )
 
         # ================= Prompts =================
@@ -61,15 +121,10 @@ class ConflictGenerator:
 
 注意：不要写具体剧情分镜；聚焦“目标与张力的结构化设计”。"""
 
+        # 世界观/角色卡已在 system 固定上下文中给出，用户消息只保留易变指令
         self.USER_PROMPT_TEMPLATE = """
-【世界观（摘录/原样）】
-{worldview_json}
-
-【角色卡（原样）】
-{characters_json}
-
 【建模目标】
-- 依据世界观约束与角色背景，生成角色的当前动机与目标（short/mid/long）。
+- 依据固定上下文中的世界观约束与角色背景，生成角色的当前动机与目标（short/mid/long）。
 - 目标之间必须相互勾连：请构造包含多种关系的 links（supports/blocks/competes/depends/enables/mutual_exclusion）。
 - 主要角色之间至少存在 1 条 blocks/competes/mutual_exclusion 边。
 - 每个目标至少 1 条 link（出或入），禁止孤立目标。
@@ -84,16 +139,13 @@ class ConflictGenerator:
 3) 输出 JSON：issues / improvements / revised_conflicts（仅修订冲突网络，不改世界观与角色卡）。"""
 
         self.REVIEW_USER_TEMPLATE = """
-【世界观（提供以便一致性校验）】
-{worldview_json}
-
-【角色卡（提供以便一致性校验）】
-{characters_json}
-
 【待审冲突网络（草稿）】
 {conflicts_json}
 
-请输出 issues / improvements / revised_conflicts（严格遵循给定 JSON Schema）。
+【已检测出的问题（本地校验结果，请优先修复）】
+{known_issues}
+
+请对照固定上下文中的世界观与角色卡，输出 issues / improvements / revised_conflicts（严格遵循给定 JSON Schema）。
 """
 
         # ================= JSON Schemas =================
@@ -230,16 +282,52 @@ class ConflictGenerator:
             }
         }
 
+        # 本地预编译校验器：微秒级完成结构校验，替代“原样返回”式的 LLM 往返
+        self._validate_conflicts = schema_cache.compile_cached(self.CONFLICT_SCHEMA["schema"])
+
+        # 内容寻址磁盘缓存：输入（seed/世界观/角色/模型）相同的重复 run()
+        # 直接读盘返回；draft/review 也分键落盘，中断后续跑不重做草稿
+        self.use_cache = use_cache
+        self.cache_dir = Path(cache_dir)
+        self._cache_key = hashlib.blake2b(
+            orjson.dumps([
+                self.seed,
+                orjson.dumps(self.worldview, option=orjson.OPT_SORT_KEYS).decode(),
+                orjson.dumps(self.characters, option=orjson.OPT_SORT_KEYS).decode(),
+                self.STRONG_TEXT_MODEL,
+                self.WEAK_TEXT_MODEL,
+            ]),
+            digest_size=16,
+        ).hexdigest()
+
+    @property
+    def client(self):
+        # 异步客户端按当前事件循环懒取：各同步入口各自 asyncio.run 换新 loop，
+        # 连接池不能跨 loop 复用（见 llm_client.get_async_client）
+        import llm_client
+        return llm_client.get_async_client(self.env_path)
+
     # ================ Core LLM ================
-    def _call_structured_json(
+    @tenacity.retry(
+        stop=tenacity.stop_after_attempt(6),
+        wait=_retry_wait,
+        retry=tenacity.retry_if_exception(_is_retryable),
+        before_sleep=_log_retry,
+        reraise=True,
+    )
+    async def _call_structured_json(
         self,
         model: str,
         system_prompt: str,
         user_prompt: str,
         json_schema: Dict[str, Any],
-        temperature: float
+        temperature: float,
+        scanner: Optional[ArrayElementScanner] = None,
+        strict: bool = False
     ) -> Dict[str, Any]:
-        resp = self.client.responses.create(
+        # 流式接收：文本片段一边到达一边喂给扫描器，下游工作（校验/预取）
+        # 与生成重叠，不必等最后一个 token 才开始
+        async with self.client.responses.stream(
             model=model,
             temperature=temperature,
             input=[
@@ -250,12 +338,16 @@ class ConflictGenerator:
                 "format": {
                     "type": "json_schema",
                     "name": json_schema.get("name", "structured_output"),
-                    "strict": False,
+                    "strict": strict,
                     "schema": json_schema["schema"],
                 }
             },
-        )
-        return json.loads(resp.output_text)
+        ) as stream:
+            async for event in stream:
+                if scanner is not None and event.type == "response.output_text.delta":
+                    scanner.feed(event.delta)
+            resp = await stream.get_final_response()
+        return _loads(resp.output_text)
 
     # ================ Internal Builders ================
     def _extract_actor_index(self) -> List[Dict[str, Any]]:
@@ -276,61 +368,282 @@ class ConflictGenerator:
         return actors
 
     def _build_generation_user_prompt(self) -> str:
-        actors = self._extract_actor_index()
-        scaffold = {
-            "worldview": self.worldview,
-            "actors_index": actors,
-            "characters_full": self.characters.get("final_characters", self.characters)  # 完整角色卡以便引用记忆/经历
-        }
-        return self.USER_PROMPT_TEMPLATE.format(
-            worldview_json=json.dumps(self.worldview, ensure_ascii=False, indent=2),
-            characters_json=json.dumps(scaffold["characters_full"], ensure_ascii=False, indent=2),
-        )
+        return self.USER_PROMPT_TEMPLATE
 
-    def _build_review_user_prompt(self, conflicts_json: Dict[str, Any]) -> str:
-        return self.REVIEW_USER_TEMPLATE.format(
-            worldview_json=json.dumps(self.worldview, ensure_ascii=False, indent=2),
-            characters_json=json.dumps(self.characters.get("final_characters", self.characters), ensure_ascii=False, indent=2),
-            conflicts_json=json.dumps(conflicts_json, ensure_ascii=False, indent=2)
-        )
+    def _build_review_user_prompt(self, conflicts_json: Dict[str, Any],
+                                  known_issues: Optional[List[str]] = None) -> str:
+        # render = 预编译版 format：模板只切分一次，且草稿内容里出现 {} 也不会注入
+        return render(self.REVIEW_USER_TEMPLATE,
+                      conflicts_json=_dumps(conflicts_json),
+                      known_issues=_dumps(known_issues) if known_issues else "（无）")
 
     # ================ Pipeline Steps ================
-    def generate_draft(self) -> Dict[str, Any]:
-        random.seed(self.seed)
+    async def generate_draft(self, on_actor=None) -> Dict[str, Any]:
+        """生成草稿。on_actor: 每个 actors 元素在流中闭合时的回调，
+        供下游（如基于参与者预取上下文）与生成重叠执行。"""
         uprompt = self._build_generation_user_prompt()
-        draft = self._call_structured_json(
+        scanner = ArrayElementScanner("actors", on_actor) if on_actor is not None else None
+        draft = await self._call_structured_json(
             model=self.STRONG_TEXT_MODEL,
-            system_prompt=self.SYSTEM_PROMPT,
+            system_prompt=self._context_prefix + self.SYSTEM_PROMPT,
             user_prompt=uprompt,
             json_schema=self.CONFLICT_SCHEMA,
-            temperature=0.95
+            temperature=0.95,
+            scanner=scanner
         )
         return draft
 
-    def review_and_revise(self, draft_conflicts: Dict[str, Any]) -> Dict[str, Any]:
-        uprompt = self._build_review_user_prompt(draft_conflicts)
-        review = self._call_structured_json(
+    async def generate_draft_packed(self, cluster_size: int = 3) -> Dict[str, Any]:
+        """大角色阵容：按参与者簇拆成多个子图指令，但仍只发一个请求。
+
+        单体大提示词会拖慢生成并降低质量；这里把 actors 索引切成
+        ~cluster_size 一簇，让模型在一次调用里为每簇独立产出一个
+        ConflictNetwork 片段（fragments 数组），客户端再合并。
+        同样的 token 量只占 1 个 RPM 配额，也摊薄了共享上下文的 prefill。
+        """
+        clusters = [self._actors_index[i:i + cluster_size]
+                    for i in range(0, len(self._actors_index), cluster_size)]
+        directives = [{"cluster": i, "actor_ids": [a["id"] for a in c]}
+                      for i, c in enumerate(clusters)]
+        user = (
+            "【子图建模指令】以下数组每个元素指定一个参与者簇；请为每个簇独立建模，"
+            "输出 {\"fragments\": [...]}，fragments[i] 对应第 i 个簇。"
+            "簇间允许引用对方目标（合并后校验）。\n"
+            + _dumps(directives) + "\n"
+            + self.USER_PROMPT_TEMPLATE
+        )
+        schema = {
+            "name": "ConflictNetworkFragments",
+            "schema": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "fragments": {"type": "array", "items": self.CONFLICT_SCHEMA["schema"]},
+                },
+                "required": ["fragments"],
+            },
+        }
+        out = await self._call_structured_json(
+            model=self.STRONG_TEXT_MODEL,
+            system_prompt=self._context_prefix + self.SYSTEM_PROMPT,
+            user_prompt=user,
+            json_schema=schema,
+            temperature=0.95
+        )
+        return self._merge_fragments(out.get("fragments", []))
+
+    def _merge_fragments(self, fragments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并子图片段：actors 按 id 去重并集，goals/links 拼接；
+        重复 goal_id 加簇前缀重命名，并同步修正该片段内的引用。"""
+        merged: Dict[str, Any] = {"actors": [], "goals": [], "links": [],
+                                  "tensions": [], "progression": [], "consistency_rules": []}
+        seen_actors: set = set()
+        seen_goals: set = set()
+        for i, frag in enumerate(fragments):
+            if not isinstance(frag, dict):
+                continue
+            rename: Dict[str, str] = {}
+            for actor in frag.get("actors", []):
+                if actor.get("id") not in seen_actors:
+                    seen_actors.add(actor.get("id"))
+                    merged["actors"].append(actor)
+            for goal in frag.get("goals", []):
+                gid = goal.get("goal_id", "")
+                if gid in seen_goals:
+                    new_gid = f"c{i}:{gid}"
+                    rename[gid] = new_gid
+                    goal = {**goal, "goal_id": new_gid}
+                    gid = new_gid
+                seen_goals.add(gid)
+                merged["goals"].append(goal)
+            for link in frag.get("links", []):
+                link = dict(link)
+                link["source_goal_id"] = rename.get(link.get("source_goal_id"), link.get("source_goal_id"))
+                link["target_goal_id"] = rename.get(link.get("target_goal_id"), link.get("target_goal_id"))
+                merged["links"].append(link)
+            for tension in frag.get("tensions", []):
+                tension = dict(tension)
+                tension["involved_goal_ids"] = [
+                    rename.get(x, x) for x in tension.get("involved_goal_ids", [])]
+                merged["tensions"].append(tension)
+            merged["progression"].extend(frag.get("progression", []))
+            for rule in frag.get("consistency_rules", []):
+                if rule not in merged["consistency_rules"]:
+                    merged["consistency_rules"].append(rule)
+        try:
+            self._validate_conflicts(merged)
+        except fastjsonschema.JsonSchemaException:
+            pass  # 合并稿交由审阅与 final_schema_check 修复
+        return merged
+
+    # 工具调用的请求形态走不进 _call_structured_json，重试策略单独挂同一份
+    @tenacity.retry(
+        stop=tenacity.stop_after_attempt(6),
+        wait=_retry_wait,
+        retry=tenacity.retry_if_exception(_is_retryable),
+        before_sleep=_log_retry,
+        reraise=True,
+    )
+    async def generate_and_review(self) -> (Optional[Dict[str, Any]], Optional[Dict[str, Any]]):
+        """草稿与自评在同一轮并行工具调用中产出，省一次完整网络往返。
+
+        声明 emit_draft / emit_review 两个工具并开启 parallel_tool_calls，
+        提示模型在同一个回合先产草稿、随即对自己的草稿做审阅。
+        返回 (draft, review)；模型只调了其中一个工具时对应位置为 None，
+        由调用方回退到顺序路径。
+        """
+        tools = [
+            {
+                "type": "function",
+                "name": "emit_draft",
+                "description": "输出矛盾网络草稿（ConflictNetwork）",
+                "parameters": self.CONFLICT_SCHEMA["schema"],
+            },
+            {
+                "type": "function",
+                "name": "emit_review",
+                "description": "对本回合刚产出的草稿做一致性审阅与修订（ConflictReview）",
+                "parameters": self.REVIEW_SCHEMA["schema"],
+            },
+        ]
+        system = (self._context_prefix + self.SYSTEM_PROMPT + "\n\n" + self.REVIEW_SYSTEM +
+                  "\n\n【调用方式】请在同一回合内依次调用两个工具："
+                  "先 emit_draft 产出草稿，再立即以审阅者身份对该草稿调用 emit_review。")
+        resp = await self.client.responses.create(
+            model=self.STRONG_TEXT_MODEL,
+            temperature=0.95,
+            input=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": self._build_generation_user_prompt()},
+            ],
+            tools=tools,
+            parallel_tool_calls=True,
+        )
+        draft = review = None
+        for item in resp.output:
+            if getattr(item, "type", None) != "function_call":
+                continue
+            if item.name == "emit_draft":
+                draft = _loads(item.arguments)
+            elif item.name == "emit_review":
+                review = _loads(item.arguments)
+        return draft, review
+
+    def _draft_issues(self, draft: Dict[str, Any]) -> List[str]:
+        """草稿的本地体检：Schema 校验 + 图级一致性，返回问题列表。"""
+        issues: List[str] = []
+        try:
+            self._validate_conflicts(draft)
+        except fastjsonschema.JsonSchemaException as e:
+            issues.append(f"schema: {e}")
+        issues.extend(self._local_validate(draft))
+        return issues
+
+    async def review_and_revise(self, draft_conflicts: Dict[str, Any],
+                                known_issues: Optional[List[str]] = None) -> Dict[str, Any]:
+        uprompt = self._build_review_user_prompt(draft_conflicts, known_issues)
+        review = await self._call_structured_json(
             model=self.STRONG_TEXT_MODEL,
-            system_prompt=self.REVIEW_SYSTEM,
+            system_prompt=self._context_prefix + self.REVIEW_SYSTEM,
             user_prompt=uprompt,
             json_schema=self.REVIEW_SCHEMA,
-            temperature=0.4
+            # 审阅是判定性任务：温度 0，输出可复现，
+            # 重复运行时提示词前缀缓存与响应缓存都能命中。
+            # 注意不开 strict：REVIEW_SCHEMA 的嵌套对象带可选键，
+            # 不满足 strict 模式“全 required + 全 additionalProperties=false”的前置条件
+            temperature=0.0,
         )
         return review
 
-    def final_schema_check(self, conflicts: Dict[str, Any]) -> Dict[str, Any]:
-        # 用强模型做一次结构校验（原样返回）
-        checked = self._call_structured_json(
-            model=self.WEAK_TEXT_MODEL,
-            system_prompt="请把以下 JSON 原样返回（用于冲突网络 Schema 校验）。",
-            user_prompt=json.dumps(conflicts, ensure_ascii=False),
-            json_schema=self.CONFLICT_SCHEMA,
-            temperature=0.0
-        )
-        return checked
+    # 视为“冲突”的关系类型（主角间至少要有一条）
+    _CONFLICT_RELATIONS = frozenset({"blocks", "competes", "mutual_exclusion"})
+
+    def _local_validate(self, conflicts: Dict[str, Any]) -> List[str]:
+        """图级一致性检查，纯本地毫秒级完成，不再指望模型自查：
+        - 每个目标至少 1 条 link（出或入）
+        - link 两端的 goal_id 必须存在
+        - 任意两名主要角色之间至少 1 条 blocks/competes/mutual_exclusion 边
+        返回问题描述列表；空列表代表通过。
+        """
+        issues: List[str] = []
+        goals = conflicts.get("goals", []) or []
+        links = conflicts.get("links", []) or []
+        goal_owner = {g.get("goal_id"): g.get("owner_id") for g in goals if isinstance(g, dict)}
+
+        degree: Counter = Counter()
+        conflict_pairs: set = set()
+        for link in links:
+            if not isinstance(link, dict):
+                continue
+            src, dst = link.get("source_goal_id"), link.get("target_goal_id")
+            for gid in (src, dst):
+                if gid not in goal_owner:
+                    issues.append(f"link 引用了不存在的目标: {gid}")
+            degree[src] += 1
+            degree[dst] += 1
+            if link.get("relation") in self._CONFLICT_RELATIONS:
+                a, b = goal_owner.get(src), goal_owner.get(dst)
+                if a and b and a != b:
+                    conflict_pairs.add(frozenset((a, b)))
+
+        orphans = sorted(gid for gid in goal_owner if degree[gid] == 0)
+        if orphans:
+            issues.append("孤立目标（无任何 link）: " + ", ".join(orphans))
+
+        primary_ids = sorted(a.get("id", "") for a in conflicts.get("actors", []) or []
+                             if isinstance(a, dict) and a.get("role") == "primary")
+        for pa, pb in combinations(primary_ids, 2):
+            if frozenset((pa, pb)) not in conflict_pairs:
+                issues.append(f"主要角色 {pa} 与 {pb} 之间缺少 blocks/competes/mutual_exclusion 边")
+        return issues
+
+    async def final_schema_check(self, conflicts: Dict[str, Any], strict: bool = True) -> Dict[str, Any]:
+        # 本地编译校验替代“原样返回”的 LLM 往返；通过则原样返回，零网络成本
+        try:
+            self._validate_conflicts(conflicts)
+            return conflicts
+        except fastjsonschema.JsonSchemaException as e:
+            if not strict:
+                return conflicts
+            # 校验失败才退回一次弱模型修复（把错误信息嵌入提示词）
+            return await self._call_structured_json(
+                model=self.WEAK_TEXT_MODEL,
+                system_prompt=self._context_prefix +
+                "以下冲突网络 JSON 未通过 ConflictNetwork Schema 校验。请在尽量保留原内容的前提下修复结构问题，仅输出修复后的 JSON。",
+                user_prompt=f"【校验错误】{e}\n\n【待修复 JSON】\n" + _dumps(conflicts),
+                json_schema=self.CONFLICT_SCHEMA,
+                temperature=0.0,
+            )
+
+    # ================ Disk Cache ================
+    def _cache_path(self, kind: str) -> Path:
+        return self.cache_dir / f"{self._cache_key}.{kind}.json"
+
+    def _cache_read(self, kind: str) -> Optional[Dict[str, Any]]:
+        if not self.use_cache:
+            return None
+        try:
+            p = self._cache_path(kind)
+            if p.exists():
+                return _loads(p.read_bytes())
+        except Exception:
+            pass  # 缓存损坏视同未命中
+        return None
+
+    def _cache_write(self, kind: str, payload: Dict[str, Any]) -> None:
+        if not self.use_cache:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            p = self._cache_path(kind)
+            tmp = p.with_name(p.name + f".{os.getpid()}.tmp")
+            tmp.write_bytes(orjson.dumps(payload))
+            os.replace(tmp, p)  # 原子替换，读方不会见到半写文件
+        except Exception:
+            pass  # 缓存写失败不阻断主流程
 
     # ================ Public API ================
-    def run(self) -> Dict[str, Any]:
+    async def run_async(self) -> Dict[str, Any]:
         """
         1) 生成矛盾网络草稿（actors/goals/links/tensions/progression）
         2) 进行一次一致性审阅与修订
@@ -339,20 +652,181 @@ class ConflictGenerator:
             - 每个目标至少1条 link
             - 主要角色之间至少存在 blocks / competes / mutual_exclusion
         """
-        draft = self.generate_draft()
-        review = self.review_and_revise(draft)
+        # 输入未变的重复 run：直接读盘返回完整结果
+        cached_result = self._cache_read("result")
+        if cached_result is not None:
+            return cached_result
+
+        # 中间产物缓存：中断后续跑不重做已完成的阶段
+        draft = self._cache_read("draft")
+        review = self._cache_read("review")
+        if draft is None and review is None:
+            if len(self._actors_index) > 6:
+                # 大阵容：单体提示词质量/时延都会劣化，改用子图打包单请求
+                draft = await self.generate_draft_packed()
+            else:
+                # 先试并行工具调用（草稿+自评一轮完成）；缺哪段就顺序补哪段
+                draft, review = await self.generate_and_review()
+                if draft is None:
+                    # 只回了审阅没回草稿：该审阅评的是一份从未捕获的草稿，
+                    # 丢弃它，让新草稿走完整的顺序路径（体检→按需送审）
+                    review = None
+        if draft is None:
+            draft = await self.generate_draft()
+        self._cache_write("draft", draft)
+        if review is None:
+            # 草稿已通过本地 Schema+图校验时直接跳过审阅往返；
+            # 有问题才送审，并把具体问题列表喂给审阅者以收窄其任务
+            draft_issues = self._draft_issues(draft)
+            if not draft_issues:
+                review = {"issues": [], "improvements": []}
+            else:
+                review = await self.review_and_revise(draft, known_issues=draft_issues)
+        self._cache_write("review", review)
         final_conflicts = review.get("revised_conflicts", draft)
-        final_conflicts = self.final_schema_check(final_conflicts)
+        final_conflicts = await self.final_schema_check(final_conflicts)
 
-        return {
+        result = {
             "seed": self.seed,
             "draft_conflicts": draft,
             "review_report": {
                 "issues": review.get("issues", []),
-                "improvements": review.get("improvements", [])
+                "improvements": review.get("improvements", []),
+                # 本地图检查结果：零 LLM 成本暴露结构性问题
+                "local_graph_issues": self._local_validate(final_conflicts)
             },
             "final_conflicts": final_conflicts
         }
+        self._cache_write("result", result)
+        return result
+
+    def run(self) -> Dict[str, Any]:
+        """同步入口：保持原有调用方式不变。"""
+        return asyncio.run(self.run_async())
+
+    @classmethod
+    def run_many(cls, jobs: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """并发生成多组矛盾网络。
+
+        jobs: __init__ 的 kwargs 列表（env_path/worldview/characters/seed...）。
+        以 Semaphore 限流后 gather，吞吐随速率限制允许的并发数线性放大。
+        """
+        async def _run_all() -> List[Dict[str, Any]]:
+            sem = asyncio.Semaphore(max_concurrency)
+
+            async def _one(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+                async with sem:
+                    return await cls(**kwargs).run_async()
+
+            return list(await asyncio.gather(*[_one(j) for j in jobs]))
+        return asyncio.run(_run_all())
+
+    # ================ Batch API（离线批量，50% 成本） ================
+    @staticmethod
+    def _batch_client(g: "ConflictGenerator") -> "OpenAI":
+        # Batch 的提交/轮询是控制面操作，用同步客户端即可
+        from openai import OpenAI
+        return OpenAI(api_key=g.OPENAI_API_KEY,
+                      base_url=g.OPENAI_BASE_URL if g.OPENAI_BASE_URL else None)
+
+    @classmethod
+    def submit_batch(cls, jobs: List["ConflictGenerator"], stage: str = "draft") -> str:
+        """把 N 个生成器同一阶段的请求打包为一个 Batch 任务，返回 batch_id。
+
+        stage="draft" 打包草稿生成；stage="review" 打包审阅
+        （要求各生成器已通过 wait_for_batch 拿到 _batch_draft）。
+        Batch API 成本减半、速率配额独立，适合回归/评测类离线批量。
+        """
+        lines = []
+        for i, g in enumerate(jobs):
+            if stage == "draft":
+                system = g._context_prefix + g.SYSTEM_PROMPT
+                user = g._build_generation_user_prompt()
+                schema, temperature = g.CONFLICT_SCHEMA, 0.95
+            else:
+                system = g._context_prefix + g.REVIEW_SYSTEM
+                user = g._build_review_user_prompt(g._batch_draft)
+                schema, temperature = g.REVIEW_SCHEMA, 0.4
+            body = {
+                "model": g.STRONG_TEXT_MODEL,
+                "temperature": temperature,
+                "input": [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                "text": {
+                    "format": {
+                        "type": "json_schema",
+                        "name": schema.get("name", "structured_output"),
+                        "strict": False,
+                        "schema": schema["schema"],
+                    }
+                },
+            }
+            lines.append(_dumps({
+                "custom_id": f"{i}-{g.seed}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": body,
+            }))
+        client = cls._batch_client(jobs[0])
+        upload = client.files.create(
+            file=("conflicts_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch")
+        batch = client.batches.create(
+            input_file_id=upload.id, endpoint="/v1/responses", completion_window="24h")
+        return batch.id
+
+    @classmethod
+    def wait_for_batch(cls, jobs: List["ConflictGenerator"], batch_id: str,
+                       poll_interval: float = 30.0) -> List[Optional[Dict[str, Any]]]:
+        """轮询至批任务完成，把输出按 custom_id 映射回 jobs 顺序返回。"""
+        client = cls._batch_client(jobs[0])
+        while True:
+            batch = client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"batch {batch_id} 以 {batch.status} 结束")
+            time.sleep(poll_interval)
+        raw = client.files.content(batch.output_file_id).text
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            rec = _loads(line)
+            body = (rec.get("response") or {}).get("body") or {}
+            text = "".join(
+                part.get("text", "")
+                for item in body.get("output", [])
+                for part in item.get("content", []) or []
+                if isinstance(part, dict))
+            if text:
+                by_id[rec["custom_id"]] = _loads(text)
+        return [by_id.get(f"{i}-{g.seed}") for i, g in enumerate(jobs)]
+
+    @classmethod
+    def run_batch(cls, jobs: List["ConflictGenerator"]) -> List[Dict[str, Any]]:
+        """草稿批 → 审阅批 → 本地校验：离线批量生成的完整链路。"""
+        drafts = cls.wait_for_batch(jobs, cls.submit_batch(jobs, "draft"))
+        for g, d in zip(jobs, drafts):
+            g._batch_draft = d
+        reviews = cls.wait_for_batch(jobs, cls.submit_batch(jobs, "review"))
+        results = []
+        for g, draft, review in zip(jobs, drafts, reviews):
+            review = review or {}
+            final = review.get("revised_conflicts", draft)
+            final = asyncio.run(g.final_schema_check(final))
+            results.append({
+                "seed": g.seed,
+                "draft_conflicts": draft,
+                "review_report": {
+                    "issues": review.get("issues", []),
+                    "improvements": review.get("improvements", [])
+                },
+                "final_conflicts": final
+            })
+        return results
 
 
 # ============== Example ==============
@@ -379,4 +853,4 @@ if __name__ == "__main__":
 
     gen = ConflictGenerator(env_path, example_worldview, example_characters, seed=20251029)
     result = gen.run()
-    print(json.dumps(result["final_conflicts"], ensure_ascii=False, indent=2))
+    print(_dumps(result["final_conflicts"], indent=True))
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""产物落盘助手：
+- orjson 原生 UTF-8 编码 + 一次 write_bytes，替代 stdlib json.dump 的
+  纯 Python 热路径与逐块小写入
+- 先写同目录临时文件再 os.replace 原子替换：进程中途崩溃不会留下
+  半截 JSON，读方永远只见旧版或新版
+- 所有 pipeline 产物（worldview/characters/conflicts/章节 runtime）统一走这里
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Any, Union
+
+import orjson
+
+
+def write_json(path: Union[str, Path], obj: Any) -> None:
+    """把 obj 以缩进 JSON 原子写入 path（产物面向人工查看，保留缩进）。"""
+    path = Path(path)
+    data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""内容寻址的 LLM 响应缓存：
+- 进程内 dict + 磁盘 .llm_cache/{sha256}.json 两层
+- key = sha256(model|temperature|system|user|schema)
+- 仅用于确定性调用（temperature==0.0）或显式声明 cacheable 的调用，
+  避免把高温采样的创作调用错误地固化
+"""
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CACHE_DIR = Path(".llm_cache")
+
+# 进程内一层缓存（磁盘命中后也会回填，避免重复读盘）
+_MEMORY: Dict[str, Any] = {}
+
+_MISS = object()
+
+
+def cache_key(model: str, temperature: float, system_prompt: str,
+              user_prompt: str, json_schema: Optional[Dict[str, Any]],
+              seed: Optional[int] = None) -> str:
+    schema_str = json.dumps(json_schema, ensure_ascii=False, sort_keys=True) if json_schema else ""
+    raw = f"{model}|{temperature}|{system_prompt}|{user_prompt}|{schema_str}"
+    if seed is not None:
+        raw += f"|{seed}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Any:
+    """命中返回缓存的输出，未命中返回 None。"""
+    if key in _MEMORY:
+        return _MEMORY[key]
+    path = CACHE_DIR / f"{key}.json"
+    if path.exists():
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                output = json.load(f)["output"]
+        except Exception:
+            return None
+        _MEMORY[key] = output
+        return output
+    return None
+
+
+def put(key: str, output: Any) -> None:
+    _MEMORY[key] = output
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = CACHE_DIR / f"{key}.json"
+        with path.open("w", encoding="utf-8") as f:
+            json.dump({"output": output}, f, ensure_ascii=False)
+    except Exception:
+        # 缓存写失败不影响主流程
+        pass
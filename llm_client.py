@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""进程级共享 OpenAI 客户端：
+- 配置经 config.get_config 读取（.env 每路径只解析一次）
+- 客户端按 (api_key, base_url) 维度复用；httpx 连接池 + HTTP/2 多路复用，
+  让并发请求共享一条 TCP/TLS 连接，省去重复握手
+"""
+from __future__ import annotations
+import asyncio
+import threading
+from typing import Dict, Tuple
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+from config import get_config
+
+_LOCK = threading.Lock()
+_SYNC_CLIENTS: Dict[Tuple[str, str], OpenAI] = {}
+
+
+def _limits() -> httpx.Limits:
+    # 上限放宽到支撑几十个生成器并发 gather 的场景
+    return httpx.Limits(max_connections=200, max_keepalive_connections=100)
+
+
+def _timeout() -> httpx.Timeout:
+    # 长生成调用给足读超时；连接阶段快速失败交给重试层
+    return httpx.Timeout(120, connect=10)
+
+
+def get_client(env_path: str) -> OpenAI:
+    """返回进程内共享的同步客户端。"""
+    cfg = get_config(env_path)
+    api_key, base_url = cfg.api_key, cfg.base_url
+    key = (api_key, base_url or "")
+    with _LOCK:
+        if key not in _SYNC_CLIENTS:
+            _SYNC_CLIENTS[key] = OpenAI(
+                api_key=api_key,
+                base_url=base_url if base_url else None,
+                http_client=httpx.Client(http2=True, limits=_limits(), timeout=_timeout()),
+            )
+        return _SYNC_CLIENTS[key]
+
+
+def get_async_client(env_path: str) -> AsyncOpenAI:
+    """返回绑定当前事件循环的异步客户端（须在 loop 内调用）。
+
+    httpx.AsyncClient 的 keep-alive 连接绑定创建它的 loop，而各同步入口
+    （run/run_many/run_batch）各自 asyncio.run 换新 loop：跨 loop 复用会在
+    旧 loop 关闭后复用其连接时抛 "Event loop is closed"。因此客户端挂在
+    loop 对象上按 (api_key, base_url) 复用，并随 loop 一起回收；
+    同一 loop 内的并发调用仍共享连接池与 HTTP/2 多路复用。
+    """
+    cfg = get_config(env_path)
+    api_key, base_url = cfg.api_key, cfg.base_url
+    key = (api_key, base_url or "")
+    loop = asyncio.get_running_loop()
+    clients: Dict[Tuple[str, str], AsyncOpenAI] = getattr(
+        loop, "_chekhov_async_clients", None)
+    if clients is None:
+        clients = {}
+        loop._chekhov_async_clients = clients
+    if key not in clients:
+        clients[key] = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url if base_url else None,
+            http_client=httpx.AsyncClient(http2=True, limits=_limits(), timeout=_timeout()),
+        )
+    return clients[key]
@@ -1,4 +1,5 @@
 # python
+import asyncio
 import os
 import json
 from pathlib import Path
@@ -6,6 +7,7 @@ from worldview_generator import WorldviewGenerator
 from character_generator import CharacterGenerator
 from conflict_generator import ConflictGenerator
 from pipelines.chapter_bootstrap import ChapterBootstrapPipeline
+from io_utils import write_json
 
 def check_and_continue(file_path: Path) -> bool:
     """检查文件是否存在，若存在则跳过生成流程"""
@@ -14,6 +16,60 @@ def check_and_continue(file_path: Path) -> bool:
         return False
     return True
 
+
+async def run_stages(example_meta: dict, env_path: str, output_dir: Path) -> tuple:
+    """依次产出 worldview / characters / conflicts。
+    三个阶段有严格数据依赖（角色依赖世界观，矛盾依赖角色），LLM 调用本身
+    无法并行；真正可重叠的是“上一阶段产物落盘”与“下一阶段的网络往返”——
+    写盘丢进线程池后立即启动下一阶段，结尾统一等待全部写盘完成。
+    """
+    pending_writes: list = []
+
+    def _save(path: Path, obj, label: str) -> None:
+        pending_writes.append(asyncio.create_task(asyncio.to_thread(write_json, path, obj)))
+        print(f"{label} saved to: {path}")
+
+    # 1) 世界观
+    worldview_path = output_dir / "worldview.json"
+    if check_and_continue(worldview_path):
+        worldview_generator = WorldviewGenerator(example_meta, env_path)
+        result = await worldview_generator.arun()
+        _save(worldview_path, result, "Worldview")
+        worldview_payload = result
+    else:
+        with open(worldview_path, "r", encoding="utf-8") as f:
+            worldview_payload = json.load(f)
+    final_worldview = worldview_payload.get("final_worldview", worldview_payload)
+
+    # 2) 角色设定
+    characters_path = output_dir / "characters.json"
+    if check_and_continue(characters_path):
+        char_gen = CharacterGenerator(env_path=env_path
+                                      ,worldview=final_worldview
+                                      ,meta=example_meta)
+        characters_payload = await char_gen.run_async()
+        _save(characters_path, characters_payload, "Characters")
+    else:
+        with open(characters_path, "r", encoding="utf-8") as f:
+            characters_payload = json.load(f)
+    final_characters = characters_payload.get("final_characters", characters_payload)
+
+    # 3) 矛盾网络
+    conflicts_path = output_dir / "conflicts.json"
+    if check_and_continue(conflicts_path):
+        conf_gen = ConflictGenerator(env_path=env_path, worldview=final_worldview, characters=final_characters)
+        conf_result = await conf_gen.run_async()
+        _save(conflicts_path, conf_result, "Conflicts")
+    else:
+        with open(conflicts_path, "r", encoding="utf-8") as f:
+            conf_result = json.load(f)
+    final_conflicts = conf_result.get("final_conflicts", conf_result)
+
+    if pending_writes:
+        await asyncio.gather(*pending_writes)
+    return final_worldview, final_characters, final_conflicts
+
+
 if __name__ == "__main__":
     # 初始输入
     example_meta = {
@@ -36,69 +92,11 @@ if __name__ == "__main__":
 
     # 保存元输入到 output/task_name/meta.json
     meta_path = output_dir / "meta.json"
-    with meta_path.open("w", encoding="utf-8") as f:
-        json.dump(example_meta, f, ensure_ascii=False, indent=2)
+    write_json(meta_path, example_meta)
     print(f"Meta saved to: {meta_path}")
 
-    worldview_path = output_dir / "worldview.json"
-
-    # 检查文件是否已存在,若存在则跳过生成流程
-    if check_and_continue(worldview_path):
-        # 创建 WorldviewGenerator 实例
-        worldview_generator = WorldviewGenerator(example_meta, env_path)
-
-        # 执行生成流程
-        result = worldview_generator.run()
-
-        # 保存结果到文件
-        with worldview_path.open("w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-
-        print(f"Worldview saved to: {worldview_path}")
-
-    # 读取
-    with open(worldview_path, "r", encoding="utf-8") as f:
-        worldview_payload = json.load(f)
-    final_worldview = worldview_payload.get("final_worldview", worldview_payload)
-
-    # 生成角色设定
-    characters_path = output_dir / "characters.json"
-    # 检查角色设定文件是否已存在,若存在则跳过生成流程
-    if check_and_continue(characters_path):
-        # 读取 Final Worldview
-        with worldview_path.open("r", encoding="utf-8") as f:
-            worldview_payload = json.load(f)
-        final_worldview = worldview_payload.get("final_worldview", worldview_payload)  # 兼容两种包装
-
-        # 生成角色
-        char_gen = CharacterGenerator(env_path=env_path
-                                      ,worldview=final_worldview
-                                      ,meta=example_meta)
-        char_result = char_gen.run()
-
-        with characters_path.open("w", encoding="utf-8") as f:
-            json.dump(char_result, f, ensure_ascii=False, indent=2)
-
-        print(f"Characters saved to: {characters_path}")
-    with open(characters_path, "r", encoding="utf-8") as f:
-        characters_payload = json.load(f)
-    final_characters = characters_payload.get("final_characters", characters_payload)
-
-    # 生成矛盾网络
-    conflicts_path = output_dir / "conflicts.json"
-    if check_and_continue(conflicts_path):
-
-        # 生成矛盾网络
-        conf_gen = ConflictGenerator(env_path=env_path, worldview=final_worldview, characters=final_characters)
-        conf_result = conf_gen.run()
-
-        # 保存
-        with conflicts_path.open("w", encoding="utf-8") as f:
-            json.dump(conf_result, f, ensure_ascii=False, indent=2)
-        print(f"Conflicts saved to: {conflicts_path}")
-    with open(conflicts_path, "r", encoding="utf-8") as f:
-        conf_result = json.load(f)
-    final_conflicts = conf_result.get("final_conflicts", conf_result)
+    final_worldview, final_characters, final_conflicts = asyncio.run(
+        run_stages(example_meta, env_path, output_dir))
 
     chapter_n = 1
 
@@ -1,10 +1,15 @@
 from __future__ import annotations
-import json, os
+import hashlib
+import os
+import orjson
 from pathlib import Path
 from typing import Any, Dict, Optional
 from agents.director_agent import DirectorAgent
 from agents.lore_assistant import LoreAssistant
 from agents.outline_planner import OutlinePlanner
+from agents.chapter_planner import ChapterPlanner
+from llm_base import PipelineContext
+from io_utils import write_json
 
 class ChapterBootstrapPipeline:
     """阶段A：导演决策 → 设定记忆卡 → 章/节纲要
@@ -15,12 +20,24 @@ class ChapterBootstrapPipeline:
     - 第一章使用 Director 特殊提示词
     - 设定助理会尝试读取 output/{task_name}/update.json 作为上一章增量
     """
+
+    # 类级：task_name → (角色矛盾内容哈希, 首次出现的章节号)。
+    # 连续章节间角色矛盾通常不变；命中时共享块只发版本标记而非全量 JSON
+    _chars_seen: Dict[str, tuple] = {}
+
+    # 类级：已确保存在的目录。批量跑 N 章时每个实例都 mkdir 一次，
+    # 每次是一串 stat 系统调用；同一目录只建一次即可
+    _dirs_ready: set = set()
+
     def __init__(self, *, env_path: str, task_name: str, chapter_index: int,
                  meta: Dict[str, Any], worldview: Dict[str, Any],
                  characters: Optional[Dict[str, Any]] = None,
                  conflicts: Optional[Dict[str, Any]] = None,
-                 seed: Optional[int] = None):
+                 seed: Optional[int] = None,
+                 fused: bool = True):
         self.env_path = env_path
+        # fused=True 时三个 Agent 融合为一次多输出调用（共享上下文只 prefill 一次）
+        self.fused = fused
         self.task_name = task_name
         self.chapter_index = chapter_index
         self.meta = meta
@@ -31,10 +48,27 @@ class ChapterBootstrapPipeline:
 
         self.base_dir = Path(f"output/{task_name}")
         self.runtime_dir = self.base_dir / f"runtime/chapter_{chapter_index}"
-        self.runtime_dir.mkdir(parents=True, exist_ok=True)
+        if self.runtime_dir not in self._dirs_ready:
+            self.runtime_dir.mkdir(parents=True, exist_ok=True)
+            type(self)._dirs_ready.add(self.runtime_dir)
 
         self.prev_update_path = str(self.base_dir / "update.json")  # 若存在则纳入考虑
 
+        # 大块上下文只序列化一次；SharedContext 块对各 Agent 字节一致，
+        # 首个调用付全量 prefill，后续调用在缓存 TTL 内命中前缀缓存
+        # （紧凑 JSON：模型不需要缩进，省下的空白即省下的输入 token）
+        self._ctx = PipelineContext(meta=self.meta, worldview=self.worldview,
+                                    characters=self.characters, conflicts=self.conflicts)
+
+        # 跨章节 memo：角色矛盾与此前某章完全一致时，只发 unchanged 版本标记
+        chars_hash = hashlib.blake2b(
+            self._ctx.chars_conf_json.encode("utf-8"), digest_size=8).hexdigest()
+        seen = self._chars_seen.get(task_name)
+        if seen is not None and seen[0] == chars_hash and chapter_index > seen[1]:
+            self._ctx.mark_chars_unchanged(seen[1])
+        else:
+            type(self)._chars_seen[task_name] = (chars_hash, chapter_index)
+
     # 可选：上一章摘要（如果你在别处生成过）
     def _load_prev_summary(self) -> str:
         p = self.base_dir / f"runtime/chapter_{self.chapter_index-1}/summary.txt"
@@ -43,41 +77,64 @@ class ChapterBootstrapPipeline:
     def run(self) -> Dict[str, Any]:
         prev_summary = self._load_prev_summary() if self.chapter_index > 1 else ""
 
-        # 1) 导演决策
-        director = DirectorAgent(self.env_path, seed=self.seed)
-        director_decision = director.run(
-            meta=self.meta,
-            worldview=self.worldview,
-            characters=self.characters,
-            conflicts=self.conflicts,
-            prev_chapter_summary=prev_summary,
-            chapter_index=self.chapter_index,
-        )
-        (self.runtime_dir / "director_decision.json").write_text(
-            json.dumps(director_decision, ensure_ascii=False, indent=2), encoding="utf-8")
+        if self.fused:
+            # 融合模式：导演决策 + 记忆卡 + 纲要一次调用产出
+            planner = ChapterPlanner(self.env_path)
+            plan = planner.run(
+                meta=self.meta,
+                worldview=self.worldview,
+                characters=self.characters,
+                conflicts=self.conflicts,
+                prev_chapter_summary=prev_summary,
+                chapter_index=self.chapter_index,
+                update_json_path=self.prev_update_path,
+                context=self._ctx,
+            )
+            director_decision = plan["director"]
+            memory_cards = plan["cards"]
+            chapter_outline = plan["outline"]
+        else:
+            # 1) 导演决策
+            director = DirectorAgent(self.env_path, seed=self.seed)
+            director_decision = director.run(
+                meta=self.meta,
+                worldview=self.worldview,
+                characters=self.characters,
+                conflicts=self.conflicts,
+                prev_chapter_summary=prev_summary,
+                chapter_index=self.chapter_index,
+                context=self._ctx,
+            )
 
-        # 2) 设定记忆卡
-        lore = LoreAssistant(self.env_path, seed=self.seed)
-        memory_cards = lore.run(
-            meta=self.meta,
-            director_decision=director_decision,
-            worldview=self.worldview,
-            characters=self.characters,
-            conflicts=self.conflicts,
-            update_json_path=self.prev_update_path
-        )
-        (self.runtime_dir / "memory_cards.json").write_text(
-            json.dumps(memory_cards, ensure_ascii=False, indent=2), encoding="utf-8")
+            # 2) 设定记忆卡
+            lore = LoreAssistant(self.env_path, seed=self.seed)
+            memory_cards = lore.run(
+                meta=self.meta,
+                director_decision=director_decision,
+                worldview=self.worldview,
+                characters=self.characters,
+                conflicts=self.conflicts,
+                update_json_path=self.prev_update_path,
+                context=self._ctx,
+            )
 
-        # 3) 章/节纲要
-        planner = OutlinePlanner(self.env_path, seed=self.seed)
-        chapter_outline = planner.run(
-            meta=self.meta,
-            director_decision=director_decision,
-            memory_cards=memory_cards
-        )
-        (self.runtime_dir / "chapter_outline.json").write_text(
-            json.dumps(chapter_outline, ensure_ascii=False, indent=2), encoding="utf-8")
+            # 3) 章/节纲要
+            planner = OutlinePlanner(self.env_path, seed=self.seed)
+            chapter_outline = planner.run(
+                meta=self.meta,
+                director_decision=director_decision,
+                memory_cards=memory_cards,
+                context=self._ctx,
+            )
+
+        return self._write_artifacts(director_decision, memory_cards, chapter_outline)
+
+    def _write_artifacts(self, director_decision: Dict[str, Any],
+                         memory_cards: Dict[str, Any],
+                         chapter_outline: Dict[str, Any]) -> Dict[str, Any]:
+        write_json(self.runtime_dir / "director_decision.json", director_decision)
+        write_json(self.runtime_dir / "memory_cards.json", memory_cards)
+        write_json(self.runtime_dir / "chapter_outline.json", chapter_outline)
 
         # 汇总 runtime 索引
         index = {
@@ -89,6 +146,34 @@ class ChapterBootstrapPipeline:
                 "chapter_outline": str(self.runtime_dir / "chapter_outline.json"),
             }
         }
-        (self.runtime_dir / "index.json").write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+        write_json(self.runtime_dir / "index.json", index)
         return index
 
+    # ================ Batch API 两阶段路径 ================
+    # 整本书离线生成：多章 Pipeline 共用一个 planner 实例依次 schedule()，
+    # 然后 batch_id = planner.batch_submit()；outputs = planner.batch_collect(batch_id)；
+    # 最后逐章 collect(outputs) 落盘。成本减半，适合隔夜批量跑书。
+    def schedule(self, planner: Optional[ChapterPlanner] = None) -> str:
+        """把本章的融合规划请求排入 planner 的批队列，返回 custom_id。"""
+        prev_summary = self._load_prev_summary() if self.chapter_index > 1 else ""
+        planner = planner or ChapterPlanner(self.env_path)
+        req = planner.build_request(
+            meta=self.meta,
+            worldview=self.worldview,
+            characters=self.characters,
+            conflicts=self.conflicts,
+            prev_chapter_summary=prev_summary,
+            chapter_index=self.chapter_index,
+            update_json_path=self.prev_update_path,
+            context=self._ctx,
+        )
+        self._batch_planner = planner
+        self._batch_custom_id = planner.batch_enqueue(
+            custom_id=f"{self.task_name}-ch{self.chapter_index}", **req)
+        return self._batch_custom_id
+
+    def collect(self, outputs: Dict[str, Any]) -> Dict[str, Any]:
+        """从 batch_collect 的结果中取回本章规划并落盘产物。"""
+        plan = outputs[self._batch_custom_id]
+        return self._write_artifacts(plan["director"], plan["cards"], plan["outline"])
+
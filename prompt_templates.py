@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""提示词模板的预编译渲染：
+- str.format 每次调用都会重新扫描整个模板并走 format-spec 解析器，
+  对多章节反复渲染的长中文模板是纯浪费
+- 这里把模板一次性切分为「字面量/占位符」序列并按内容缓存，
+  之后每次渲染只是一次列表拼接
+- 顺带免疫占位值里出现 {} 时 str.format 的注入问题
+"""
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import Tuple
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+@lru_cache(maxsize=None)
+def _compile(template: str) -> Tuple[Tuple[bool, str], ...]:
+    """把模板切分为 (is_field, text) 序列；按模板内容缓存。"""
+    parts = []
+    pos = 0
+    for m in _PLACEHOLDER.finditer(template):
+        parts.append((False, template[pos:m.start()]))
+        parts.append((True, m.group(1)))
+        pos = m.end()
+    parts.append((False, template[pos:]))
+    return tuple(parts)
+
+
+def render(template: str, **kwargs) -> str:
+    """等价 template.format(**kwargs)，但跳过 format-spec 解析。"""
+    out = []
+    for is_field, text in _compile(template):
+        out.append(str(kwargs[text]) if is_field else text)
+    return "".join(out)
@@ -1,22 +1,67 @@
 from pathlib import Path
-import json
-from datetime import datetime
+import atexit
+import queue
+import threading
+import time
+
+import orjson
 
 LOG_DIR = Path("log")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
+# 有界队列 + 后台消费线程：调用方只付一次 put_nowait（近似零成本），
+# 磁盘 I/O 完全移出 LLM 调用的关键路径；队列满时丢日志而不是阻塞业务
+_QUEUE: "queue.Queue" = queue.Queue(maxsize=1024)
+
+
+def _worker() -> None:
+    while True:
+        payload, filepath = _QUEUE.get()
+        try:
+            # orjson 一次性产出 UTF-8 字节 + 单次 write_bytes，
+            # 替代 stdlib JSONEncoder 逐块写文件的纯 Python 热路径
+            data = orjson.dumps(
+                payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+                default=str)
+            filepath.write_bytes(data)
+        except Exception:
+            # 日志写失败不影响主流程
+            pass
+        finally:
+            _QUEUE.task_done()
+
+
+_THREAD = threading.Thread(target=_worker, name="request-logger", daemon=True)
+_THREAD.start()
+
+
+def _drain() -> None:
+    """进程退出前尽量把已入队的日志落盘。"""
+    try:
+        _QUEUE.join()
+    except Exception:
+        pass
+
+
+atexit.register(_drain)
+
+
 def log_request_response(request: dict, response: dict):
     """
-    保存日志到 log/{timestamp}.json
+    保存日志到 log/{timestamp}-{ns}.json
     timestamp 格式: YYYYMMDDhhmmss (例如 20251029123511)
-    直接使用 json.dump(..., default=str) 以简单明了地处理不可序列化对象
+    time.strftime 直接走 C 实现，免去 datetime 对象分配与 strftime 包装；
+    完整纳秒时间戳作后缀，亚秒级突发下文件名唯一（跨进程也不冲突）；
+    仅入队即返回，序列化与写盘由后台线程完成，不阻塞调用方
     """
-    ts = datetime.now().strftime("%Y%m%d%H%M%S")
-    filepath = LOG_DIR / f"{ts}.json"
+    ts = time.strftime("%Y%m%d%H%M%S")
+    filepath = LOG_DIR / f"{ts}-{time.time_ns()}.json"
     payload = {
         "timestamp": ts,
         "request": request,
         "response": response,
     }
-    with filepath.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
+    try:
+        _QUEUE.put_nowait((payload, filepath))
+    except queue.Full:
+        pass
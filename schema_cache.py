@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""JSON Schema 校验器的磁盘缓存：
+- fastjsonschema.compile() 每次进程启动都要重新做代码生成，
+  对固定不变的 Schema 是重复劳动
+- 这里把 compile_to_code 生成的 Python 源按 Schema 内容哈希落盘到
+  ~/.cache/chekhov/schemas/{hash}.py，下次启动直接 import（<1ms）
+- 磁盘不可写/缓存损坏时退回进程内编译，不影响功能
+"""
+from __future__ import annotations
+import hashlib
+import importlib.util
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import orjson
+import fastjsonschema
+
+_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", str(Path.home() / ".cache"))) / "chekhov" / "schemas"
+# 进程内已加载的校验器：同一 Schema 在多个类里复用时只 import 一次
+_LOADED: Dict[str, Callable[[Any], Any]] = {}
+
+
+def _schema_hash(schema: Dict[str, Any]) -> str:
+    return hashlib.sha256(orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)).hexdigest()[:24]
+
+
+def compile_cached(schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """等价 fastjsonschema.compile(schema)，但生成的源码按内容哈希持久化。"""
+    key = _schema_hash(schema)
+    cached = _LOADED.get(key)
+    if cached is not None:
+        return cached
+    path = _CACHE_DIR / f"{key}.py"
+    try:
+        if not path.exists():
+            code = fastjsonschema.compile_to_code(schema)
+            _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+            tmp.write_text(code, encoding="utf-8")
+            os.replace(tmp, path)  # 原子替换，并发进程安全
+        spec = importlib.util.spec_from_file_location(f"chekhov_schema_{key}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        validator = module.validate
+    except Exception:
+        # 缓存层任何故障都不应阻断校验本身
+        validator = fastjsonschema.compile(schema)
+    _LOADED[key] = validator
+    return validator
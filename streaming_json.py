@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""增量 JSON 扫描器：
+- 输入是流式到达的 JSON 文本片段（Responses API 的 output_text.delta）
+- 只做引号/括号深度跟踪，不建完整语法树
+- 指定顶层数组键后，每当该数组中一个元素闭合，立即解析并交给回调
+  （如本地 Schema 校验），让校验/落盘与网络传输重叠，并支持尽早失败
+"""
+from __future__ import annotations
+from typing import Any, Callable, List
+
+import orjson
+
+
+class ArrayElementScanner:
+    """从流式 JSON 文本中提取指定顶层数组键下的完整元素。
+
+    用法：
+        scanner = ArrayElementScanner("characters", on_element=validate_one)
+        for delta in stream: scanner.feed(delta)
+    回调抛出的异常会向上传播，调用方可借此中断流式请求。
+    """
+
+    def __init__(self, array_key: str, on_element: Callable[[Any], None]):
+        self._needle = f'"{array_key}"'
+        self._on_element = on_element
+        self._tail = ""            # 跨片段匹配键名用的尾部缓冲
+        self._armed = False        # 已看到键名，等待进入 '['
+        self._collecting = False   # 正在目标数组内收集元素
+        self._done = False         # 目标数组已闭合
+        self._element_chars: List[str] = []
+        self._depth = 0            # 元素内 {}/[] 嵌套深度
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, delta: str) -> None:
+        if self._done:
+            return
+        if not self._armed and not self._collecting:
+            # 还没定位到目标键：在（尾缓冲+新片段）里找键名
+            window = self._tail + delta
+            idx = window.find(self._needle)
+            if idx < 0:
+                self._tail = window[-len(self._needle):]
+                return
+            self._armed = True
+            rest = window[idx + len(self._needle):]
+            self._tail = ""
+            self._feed_chars(rest)
+        else:
+            self._feed_chars(delta)
+
+    def _feed_chars(self, text: str) -> None:
+        for ch in text:
+            if self._done:
+                return
+            if self._armed and not self._collecting:
+                if ch == "[":
+                    self._collecting = True
+                continue
+            # collecting 状态：逐字符跟踪元素边界
+            if self._depth > 0:
+                self._element_chars.append(ch)
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == "\\":
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                    continue
+                if ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        element = orjson.loads("".join(self._element_chars))
+                        self._element_chars = []
+                        self._on_element(element)
+                continue
+            # 深度 0：等待下一个元素开始或数组结束
+            if ch == "{" or ch == "[":
+                self._depth = 1
+                self._element_chars = [ch]
+            elif ch == "]":
+                self._done = True
+
+
+class ObjectEntryScanner:
+    """从流式 JSON 文本中提取顶层对象的完整键值对。
+
+    世界观终稿是开放键名的 Facet 对象（非数组），ArrayElementScanner 不适用；
+    这里按同样的深度跟踪思路，在每个顶层条目闭合时立即解析并回调
+    on_entry(key, value)，让单 Facet 的校验/落盘/展示与生成重叠。
+    """
+
+    def __init__(self, on_entry: Callable[[str, Any], None]):
+        self._on_entry = on_entry
+        self._started = False      # 已进入顶层对象 '{'
+        self._done = False         # 顶层对象已闭合
+        self._entry_chars: List[str] = []
+        self._depth = 0            # 当前条目值内 {}/[] 嵌套深度
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, delta: str) -> None:
+        for ch in delta:
+            if self._done:
+                return
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                continue
+            if self._in_string:
+                self._entry_chars.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._entry_chars.append(ch)
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                self._entry_chars.append(ch)
+            elif ch == "]":
+                self._depth -= 1
+                self._entry_chars.append(ch)
+            elif ch == "}":
+                if self._depth == 0:
+                    self._flush()
+                    self._done = True
+                else:
+                    self._depth -= 1
+                    self._entry_chars.append(ch)
+            elif ch == "," and self._depth == 0:
+                self._flush()
+            else:
+                self._entry_chars.append(ch)
+
+    def _flush(self) -> None:
+        text = "".join(self._entry_chars).strip()
+        self._entry_chars = []
+        if not text:
+            return
+        entry = orjson.loads("{" + text + "}")
+        for key, value in entry.items():
+            self._on_entry(key, value)
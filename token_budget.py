@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""本地 token 预算守卫：
+- 世界观/角色设定会随章节增长；盲目整体注入提示词，超出模型上下文时
+  要等一次完整网络往返才失败
+- 这里用 tiktoken 在本地先计数，超预算时做「确定性」结构化裁剪：
+  先丢可选 facet（从大到小），再压缩角色时间线，硬约束类字段永不丢弃
+- 上下文越小 prefill 越快，裁剪本身也省输入 token
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Dict
+
+import orjson
+import tiktoken
+
+# 默认提示词预算（≈128k 上下文的 80%，给输出与系统提示词留余量）
+DEFAULT_PROMPT_BUDGET = 100_000
+
+# 裁剪时永不丢弃的世界观字段（硬约束/术语规范是一致性的底线）
+_KEEP_ALWAYS = (
+    "hard_constraints", "consistency_rules", "terminology", "glossary",
+    "tone", "genre_tone",
+)
+
+# 角色时间线压缩后保留的最近条目数
+_TIMELINE_KEEP = 3
+
+
+@lru_cache(maxsize=None)
+def _enc() -> "tiktoken.Encoding":
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(_enc().encode(text))
+
+
+def shrink_worldview(worldview: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """确定性裁剪世界观：超预算时按序列化体积从大到小丢弃可选 facet。
+    预算内或无可丢字段时原样返回（不复制）。
+    """
+    if not isinstance(worldview, dict):
+        return worldview
+    if count_tokens(orjson.dumps(worldview).decode()) <= budget:
+        return worldview
+    sizes = {k: len(orjson.dumps(v)) for k, v in worldview.items()}
+    # 从大到小丢；同体积按键名排序保证跨运行确定性
+    droppable = sorted((k for k in worldview if k not in _KEEP_ALWAYS),
+                       key=lambda k: (-sizes[k], k))
+    trimmed = dict(worldview)
+    for k in droppable:
+        del trimmed[k]
+        trimmed["_truncated"] = trimmed.get("_truncated", []) + [k]
+        if count_tokens(orjson.dumps(trimmed).decode()) <= budget:
+            break
+    return trimmed
+
+
+def shrink_characters(characters: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """确定性压缩角色集合：超预算时每个角色时间线只留最近 N 条。"""
+    if not isinstance(characters, dict):
+        return characters
+    if count_tokens(orjson.dumps(characters).decode()) <= budget:
+        return characters
+    trimmed = dict(characters)
+    items = trimmed.get("characters")
+    if isinstance(items, list):
+        trimmed["characters"] = [
+            {**c, "timeline": c["timeline"][-_TIMELINE_KEEP:]}
+            if isinstance(c, dict) and isinstance(c.get("timeline"), list)
+            else c
+            for c in items
+        ]
+    return trimmed
@@ -6,65 +6,117 @@ Meta（用户元设定）单独存储；LLM 基于 Meta 自由生成 Expansion
 - 严禁人物/剧情抓手；仅世界背景
 """
 
+import asyncio
+import hashlib
 import json
-from typing import Any, Dict
+import os
+import secrets
+import textwrap
+from typing import Any, Callable, Dict, List, Optional
+
+import fastjsonschema
+import orjson
+
+import schema_cache
 from llm_base import LLMBase
+from prompt_templates import render
+from streaming_json import ObjectEntryScanner
 from agents.writing_master import WritingMaster
 
+
+# 提示词只接收这份白名单里的 meta 字段：未知键（上游随手塞进 meta 的长文本、
+# 调试字段等）不会线性放大每一次调用的输入 token，前缀也因此保持稳定。
+_META_KEYS = ("genre_tone", "audience_rating", "inspirations", "themes",
+              "medium", "era_power_level", "language", "constraints")
+
+# 审阅建议进补丁提示词前截断的上限：超过这个数量的建议对终稿质量已无增益，
+# 只会线性拉长 assemble_final 的输入。
+_MAX_SUGGESTIONS = 20
+
+
+def _clean_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """按白名单投影 meta；全部未命中时原样返回兜底（与 project_fields 同策略）。"""
+    if not isinstance(meta, dict):
+        return meta
+    projected = {k: meta[k] for k in _META_KEYS if k in meta}
+    return projected if projected else meta
+
+
+def _compact_json(obj: Any) -> str:
+    """dict/list → 紧凑 JSON；已是字符串的原样返回（生成步的 raw 输出）。
+    提示词里的缩进空白与 Python repr 引号都是白付的输入 token；
+    键排序让同一内容的提示词字节恒定，供应商前缀缓存才可能命中。"""
+    if isinstance(obj, str):
+        return obj
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode()
+
 class WorldviewGenerator(LLMBase):  # 继承 LLMBase
-    def __init__(self, example_meta: Dict[str, Any], env_path: str):
-        super().__init__(env_path)  # 调用父类初始化
+    def __init__(self, example_meta: Dict[str, Any], env_path: str,
+                 fused: Optional[bool] = None, seed: Optional[int] = None):
+        # seed 仅用于判定性调用（审阅）的可复现与缓存命中；None 时不透传
+        super().__init__(env_path, seed=seed)
         self.example_meta = example_meta
+        # meta 在构造后不再变化：只序列化一次，建议/生成/审阅提示词共用同一字符串
+        self._meta_json = _compact_json(_clean_meta(example_meta))
+        # fused=True：生成+自评+修订融合为一次结构化调用（一次往返、共享前缀）；
+        # False 回退到 生成→审阅→组装 的三段式路径。
+        # 默认跟随 CHEKHOV_FUSE（缺省开启），便于不改代码做质量对比
+        if fused is None:
+            fused = os.getenv("CHEKHOV_FUSE", "1") != "0"
+        self.fused = fused
         self.wm = WritingMaster(env_path=".env")
+        # 预编译校验器（经 schema_cache 磁盘持久化）：落盘前本地兜底，
+        # 捕捉 strict=False 下的模型漂移；逐次解释执行 Schema 的成本为零
+        self._validate_fused = schema_cache.compile_cached(self.FUSED_SCHEMA["schema"])
+        self._validate_review = schema_cache.compile_cached(self.REVIEW_SCHEMA["schema"])
+        self._validate_facet = schema_cache.compile_cached(self.FACET_SCHEMA["schema"])
 
 
 
     # =======================
     # Prompts
     # =======================
-    GENERATOR_SYSTEM = """\
+    GENERATOR_SYSTEM = textwrap.dedent("""\
     你是一名“世界观工程师（Worldbuilding Engineer）”。你的输入是元设定（Meta），你的输出是世界观（Worldview）。
     目标：输出一个结构清晰、信息密度高、具有强可写性的“世界背景规则集”。务必新鲜、有张力，能长期支撑连载创作。
 
     硬性约束（必须遵守）：
     1) 只产出“世界背景与运行规则”。严禁包含：主角、配角、具体剧情桥段、任务、章节、关卡、台词、独立场景钩子等。
-    """
+    """)
 
-    GENERATOR_USER_TEMPLATE = """\
+    GENERATOR_USER_TEMPLATE = textwrap.dedent("""\
     基于下列元设定（Meta）和参考建议，请生成世界观。
     # Meta
     {meta}
     # 建议
     {advice}
-    """
+    """)
 
-    GENERATE_ADVICE_PROMPT = """\
+    GENERATE_ADVICE_PROMPT = textwrap.dedent("""\
     我需要为小说创建基础世界观设定，你给我介绍一下需要包含什么内容，以确保世界观足够有趣且具有可写性。
     只产出“世界背景与运行规则”，严禁包含：主角、配角、具体写作手法、具体剧情桥段、任务、章节、关卡、台词等。
     下面是元数据（Meta）：
     ## Meta
     {meta}
     请给出 3-5 条简明建议。
-    """
+    """)
 
-    VALIDATOR_SYSTEM = """\
-    你是一名“世界观有趣度审阅者”。输入是 Meta（元设定）与 Worldview（世界观）
-    你的输出是一个列表，其中每个元素是一个对象，包含：
-    - target_path：修改位置（使用清晰的字段定位描述）
-    - suggestion：修改建议（简明、可操作；指出应增加/删减/重述/补充哪些要素）
+    # 仅保留 Schema 表达不了的语义性约束；输出结构交给 Schema/格式说明
+    VALIDATOR_SYSTEM = textwrap.dedent("""\
+    你是一名“世界观有趣度审阅者”。输入是 Meta（元设定）与 Worldview（世界观）。
 
     硬性约束：
     - 严禁引入人物、情节、任务、章节或对话等叙事要素；仅针对“世界背景与运行规则”提出修改建议。
-    
+
     想办法提升世界观的有趣度，使用包含但不限于以下策略：
     1) 增加冲突与张力：引入对立势力
     2) 丰富细节与设定：补充独特的文化、技术、生态等
     3) 引入悬念与谜团：设置未解之谜、隐藏力量等
     4) 明确边界与代价：定义规则的限制与违反的风险
     5) 历史与背景：提供世界的起源故事与重大事件
-    """
+    """)
 
-    VALIDATOR_USER_TEMPLATE = """\
+    VALIDATOR_USER_TEMPLATE = textwrap.dedent("""\
     请基于以下 Meta 与 Worldview（均为 JSON）进行审阅，每个审阅意见包含：
     - target_path（修改位置）
     - suggestion（修改建议）
@@ -74,16 +126,276 @@ class WorldviewGenerator(LLMBase):  # 继承 LLMBase
 
     ## Worldview
     {expansion}
-    """
+    """)
+
+    # 审阅是对照明确评分准则的结构化批评任务，弱模型即可胜任；
+    # maxItems 限幅让输出长度有界（输出 token 主导审阅延迟）
+    REVIEW_SCHEMA: Dict[str, Any] = {
+        "name": "WorldviewReview",
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "reviews": {
+                    "type": "array",
+                    "maxItems": 12,
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "target_path": {"type": "string"},
+                            "suggestion": {"type": "string"},
+                        },
+                        "required": ["target_path", "suggestion"],
+                    },
+                },
+            },
+            "required": ["reviews"],
+        },
+    }
+
+    # 并行 Facet 生成：骨架（只列 Facet 名与类型）是短输出的判定性任务，弱模型即可
+    SKELETON_SYSTEM = textwrap.dedent("""\
+    你是一名“世界观架构师”。输入是元设定（Meta）与参考建议，输出是世界观的 Facet 骨架：
+    只给出 6-8 个 Facet 的名称（name）与类型（kind，如 力量体系/地理生态/社会结构/历史起源/经济技术/悬念谜团），
+    不展开任何内容。严禁包含人物、情节等叙事要素。
+    """)
+
+    SKELETON_SCHEMA: Dict[str, Any] = {
+        "name": "WorldviewSkeleton",
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "facets": {
+                    "type": "array",
+                    "minItems": 6,
+                    "maxItems": 8,
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "name": {"type": "string"},
+                            "kind": {"type": "string"},
+                        },
+                        "required": ["name", "kind"],
+                    },
+                },
+            },
+            "required": ["facets"],
+        },
+    }
+
+    FACET_SYSTEM = textwrap.dedent("""\
+    你是一名“世界观工程师（Worldbuilding Engineer）”。本次只负责展开骨架中指定的一个 Facet。
+    要求：信息密度高、有张力、具有强可写性；明确边界、代价、失败模式与可观测信号。
+    硬性约束：只产出“世界背景与运行规则”，严禁包含人物、剧情、任务、章节、台词等叙事要素。
+    """)
+
+    FACET_USER_TEMPLATE = textwrap.dedent("""\
+    # Meta
+    {meta}
+    # 建议
+    {advice}
+    # 全部 Facet 骨架（保持与其他 Facet 互不重复、彼此呼应）
+    {skeleton}
+    # 本次要展开的 Facet
+    {facet}
+    """)
+
+    # 单 Facet 小 Schema：每路输出短而有界，N 路并行后墙钟取决于最慢一路
+    FACET_SCHEMA: Dict[str, Any] = {
+        "name": "WorldviewFacet",
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "axioms": {"type": "array", "items": {"type": "string"}},
+                "mechanics": {"type": "array", "items": {"type": "string"}},
+                "limits": {"type": "array", "items": {"type": "string"}},
+                "risks": {"type": "array", "items": {"type": "string"}},
+                "metrics": {"type": "array", "items": {"type": "string"}},
+                "implications": {"type": "array", "items": {"type": "string"}},
+                "open_questions": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["axioms", "mechanics", "limits", "risks",
+                         "metrics", "implications", "open_questions"],
+        },
+    }
+
+    # 补丁提示词冻结为类常量：两条 assemble 路径共用同一字节序列；
+    # 静态要求置前、易变的 DRAFT/SUGGESTIONS JSON 收尾，前缀跨调用稳定
+    PATCHER_SYSTEM = textwrap.dedent("""\
+    你是一名“世界观补丁工程师”。你的任务是将审阅建议数组有序地应用到给定的世界观草稿上，产出修订版世界观。
+    必须遵守：
+    1) 仅修改“世界背景与运行规则”；严禁引入人物、情节、任务、对话等叙事要素。
+    2) 优先在 target_path 指向的位置进行就地修订
+    3) 保留原有术语与结构风格，不做无谓重命名；必要时可在原字段下增加小型子结构以承载新信息。
+    """)
 
+    PATCHER_USER_TEMPLATE = textwrap.dedent("""\
+    # 产出要求
+    - 输出修订后的世界观（完整体，不只是差异）。
+    - 尽量减少冗余与空话，保持信息密度与可写性。
+
+    # DRAFT
+    {draft_str}
+
+    # SUGGESTIONS
+    {suggestions_str}
+    """)
+
+    # best-of-N：排序器只打分不改写，用弱模型即可
+    RANKER_SYSTEM = textwrap.dedent("""\
+    你是一名“世界观候选排序者”。输入是同一 Meta 下的多份世界观候选（带序号 idx）。
+    按有趣度、信息密度、可写性与内部一致性为每份候选打分（0-10，可有小数），
+    并给出一句话理由。只打分，不修改候选内容。
+    """)
+
+    RANKER_USER_TEMPLATE = textwrap.dedent("""\
+    ## Meta
+    {meta}
+
+    ## 候选列表
+    {candidates}
+
+    请为每个候选输出 idx / score / rationale。
+    """)
+
+    RANKING_SCHEMA: Dict[str, Any] = {
+        "name": "WorldviewRanking",
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "rankings": {
+                    "type": "array",
+                    "minItems": 1,
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "idx": {"type": "integer"},
+                            "score": {"type": "number"},
+                            "rationale": {"type": "string"},
+                        },
+                        "required": ["idx", "score", "rationale"],
+                    },
+                },
+            },
+            "required": ["rankings"],
+        },
+    }
+
+    # 融合模式：在一次调用内完成 生成→自评→修订，省去两次完整网络往返。
+    # 三段式的约束原文直接复用，保证两条路径的语义一致。
+    FUSED_SYSTEM = textwrap.dedent("""\
+    你将在一次调用中依次完成三个角色的工作，分别输出到对应的 JSON 字段：
+
+    ## 角色一：世界观工程师（输出到 draft_worldview）
+    """) + GENERATOR_SYSTEM + textwrap.dedent("""
+
+    ## 角色二：有趣度审阅者（输出到 issues）
+    """) \
+        + VALIDATOR_SYSTEM + textwrap.dedent("""
+
+    ## 角色三：补丁工程师（输出到 revised_worldview）
+    将 issues 中的建议有序应用到 draft_worldview 上，输出修订后的完整世界观；
+    保留原有术语与结构风格，不做无谓重命名。
+
+    ## 总体约束
+    - 按 draft_worldview → issues → revised_worldview 的顺序推理，一次性输出三者。
+    - improvements 概述每条建议的落实情况。
+    """)
+
+    # 仅约束骨架：世界观是开放 Facets，draft/revised 保持自由结构
+    FUSED_SCHEMA: Dict[str, Any] = {
+        "name": "WorldviewFused",
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "draft_worldview": {"type": "object", "additionalProperties": True},
+                "issues": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "target_path": {"type": "string"},
+                            "suggestion": {"type": "string"},
+                        },
+                        "required": ["target_path", "suggestion"],
+                    },
+                },
+                "improvements": {"type": "array", "items": {"type": "string"}},
+                "revised_worldview": {"type": "object", "additionalProperties": True},
+            },
+            "required": ["draft_worldview", "issues", "improvements", "revised_worldview"],
+        },
+    }
+
+
+    @property
+    def meta_hash(self) -> str:
+        """meta 的内容指纹（键序稳定）。懒计算并缓存在实例上，
+        供提示词缓存路由/产物命名等场景复用，避免每次重排序+重序列化。"""
+        h = getattr(self, "_meta_hash", None)
+        if h is None:
+            h = self._meta_hash = hashlib.blake2b(
+                orjson.dumps(self.example_meta, option=orjson.OPT_SORT_KEYS),
+                digest_size=8).hexdigest()
+        return h
+
+    # 本类所有调用都以同一份 meta 为稳定前缀：统一用 meta 内容哈希作
+    # prompt_cache_key，把请求路由到同一供应商缓存分片，提高前缀缓存命中率
+    def call_structured_json(self, **kwargs: Any) -> Any:
+        kwargs.setdefault("prompt_cache_key", self.meta_hash)
+        return super().call_structured_json(**kwargs)
+
+    def call_structured_json_stream(self, **kwargs: Any) -> Any:
+        kwargs.setdefault("prompt_cache_key", self.meta_hash)
+        return super().call_structured_json_stream(**kwargs)
+
+    async def acall_structured_json(self, **kwargs: Any) -> Any:
+        kwargs.setdefault("prompt_cache_key", self.meta_hash)
+        return await super().acall_structured_json(**kwargs)
+
+    def _meta_json_for(self, meta: Dict[str, Any]) -> str:
+        """run() 路径传入的就是 example_meta：直接复用构造期缓存的序列化结果。"""
+        if meta is self.example_meta:
+            return self._meta_json
+        return _compact_json(_clean_meta(meta))
 
     def get_advice(self, meta: Dict[str, Any]) -> str:
-        advice = self.wm.provide_guidance(prompt=self.GENERATE_ADVICE_PROMPT.format(meta=str(meta)))
+        advice = self.wm.provide_guidance(
+            prompt=render(self.GENERATE_ADVICE_PROMPT, meta=self._meta_json_for(meta)))
         return advice
 
 
+    def generate_with_single_iteration(self, meta: Dict[str, Any], advice: str) -> Dict[str, Any]:
+        """一次调用产出 草稿+审阅意见+修订版，替代 生成/审阅/组装 三次往返。"""
+        up = render(self.GENERATOR_USER_TEMPLATE, advice=advice, meta=self._meta_json_for(meta))
+        return self.call_structured_json(
+            model=self.STRONG_TEXT_MODEL,
+            system_prompt=self.FUSED_SYSTEM,
+            user_prompt=up,
+            json_schema=self.FUSED_SCHEMA,
+            temperature=0.95
+        )
+
+    async def agenerate_with_single_iteration(self, meta: Dict[str, Any], advice: str) -> Dict[str, Any]:
+        up = render(self.GENERATOR_USER_TEMPLATE, advice=advice, meta=self._meta_json_for(meta))
+        return await self.acall_structured_json(
+            model=self.STRONG_TEXT_MODEL,
+            system_prompt=self.FUSED_SYSTEM,
+            user_prompt=up,
+            json_schema=self.FUSED_SCHEMA,
+            temperature=0.95
+        )
+
     def generate_expansion(self, meta: Dict[str, Any],advice:str) -> Dict[str, Any]:
-        up = self.GENERATOR_USER_TEMPLATE.format(advice=advice,meta=str(meta))
+        up = render(self.GENERATOR_USER_TEMPLATE, advice=advice, meta=self._meta_json_for(meta))
         expansion = self.call_structured_json(  # 使用父类的 call_structured_json 方法
             model=self.STRONG_TEXT_MODEL,
             system_prompt=self.GENERATOR_SYSTEM,
@@ -92,27 +404,121 @@ class WorldviewGenerator(LLMBase):  # 继承 LLMBase
         )
         return expansion
 
-    def review_and_revise(self, meta: Dict[str, Any], expansion: Dict[str, Any]) -> Dict[str, Any]:
-
-        up = self.VALIDATOR_USER_TEMPLATE.format(
-            meta=str(meta),
-            expansion=str(expansion)
+    async def agenerate_expansion(self, meta: Dict[str, Any], advice: str) -> Dict[str, Any]:
+        up = render(self.GENERATOR_USER_TEMPLATE, advice=advice, meta=self._meta_json_for(meta))
+        return await self.acall_structured_json(
+            model=self.STRONG_TEXT_MODEL,
+            system_prompt=self.GENERATOR_SYSTEM,
+            user_prompt=up,
+            temperature=0.95
         )
 
-        review = self.call_structured_json(
+    async def _flesh_facet(self, meta: Dict[str, Any], advice: str,
+                           skeleton_json: str, facet: Dict[str, Any]) -> Dict[str, Any]:
+        up = render(self.FACET_USER_TEMPLATE,
+                    meta=self._meta_json_for(meta), advice=advice,
+                    skeleton=skeleton_json, facet=_compact_json(facet))
+        return await self.acall_structured_json(
             model=self.STRONG_TEXT_MODEL,
-            system_prompt=self.VALIDATOR_SYSTEM,
+            system_prompt=self.FACET_SYSTEM,
             user_prompt=up,
-            json_schema=None,
-            temperature=0.4
+            json_schema=self.FACET_SCHEMA,
+            temperature=0.95,
+        )
+
+    async def agenerate_expansion_parallel(self, meta: Dict[str, Any],
+                                           advice: str) -> Dict[str, Any]:
+        """agenerate_expansion 的并行版本：骨架一次 + 每 Facet 一路。
+
+        单次调用生成全部 Facet 时，输出 token 只能逐个串行生成，是整步延迟的
+        主导项。这里先用弱模型出 Facet 骨架（短输出），再按 Facet 扇出 N 路
+        强模型小调用并发展开（gather 经 LLMBase 的并发信号量限流），
+        墙钟从“全部 Facet 之和”降到“骨架 + 最慢一个 Facet”。
+        """
+        up = render(self.GENERATOR_USER_TEMPLATE, advice=advice,
+                    meta=self._meta_json_for(meta))
+        skeleton = await self.acall_structured_json(
+            model=self.WEAK_TEXT_MODEL,
+            system_prompt=self.SKELETON_SYSTEM,
+            user_prompt=up,
+            json_schema=self.SKELETON_SCHEMA,
+            temperature=0.7,
         )
-        return review
+        facets = skeleton["facets"]
+        # 骨架全文随每路请求下发，各 Facet 知道彼此的存在、避免内容重叠
+        skeleton_json = _compact_json(facets)
+        bodies = await asyncio.gather(
+            *[self._flesh_facet(meta, advice, skeleton_json, f) for f in facets])
+        expansion: Dict[str, Any] = {}
+        for f, body in zip(facets, bodies):
+            # 先校验再补 kind：FACET_SCHEMA 为 additionalProperties=False，
+            # kind 是拼装阶段附加的骨架元信息，不在单 Facet 的输出契约里
+            self._validate_facet(body)
+            body["kind"] = f["kind"]
+            expansion[f["name"]] = body
+        return expansion
 
-    def assemble_final(self, draft: Dict[str, Any], suggestions: Any) -> Dict[str, Any]:
+    def review_and_revise(self, meta: Dict[str, Any], expansion: Dict[str, Any]) -> Any:
+
+        up = render(self.VALIDATOR_USER_TEMPLATE,
+                    meta=self._meta_json_for(meta), expansion=_compact_json(expansion))
+
+        # 审阅是判定性任务：温度 0 + 固定 seed，输出可复现，
+        # 同一草稿重跑时客户端响应缓存与服务端前缀缓存都能稳定命中。
+        # 评审按准则打分即可，先走弱模型；结构不合格时升级强模型兜底
+        try:
+            review = self.call_structured_json(
+                model=self.WEAK_TEXT_MODEL,
+                system_prompt=self.VALIDATOR_SYSTEM,
+                user_prompt=up,
+                json_schema=self.REVIEW_SCHEMA,
+                temperature=0.0,
+                seed=self.seed
+            )
+            self._validate_review(review)
+        except (fastjsonschema.JsonSchemaException, ValueError, orjson.JSONDecodeError):
+            review = self.call_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt=self.VALIDATOR_SYSTEM,
+                user_prompt=up,
+                json_schema=self.REVIEW_SCHEMA,
+                temperature=0.0,
+                seed=self.seed
+            )
+        return review["reviews"]
+
+    async def areview_and_revise(self, meta: Dict[str, Any], expansion: Dict[str, Any]) -> Any:
+        up = render(self.VALIDATOR_USER_TEMPLATE,
+                    meta=self._meta_json_for(meta), expansion=_compact_json(expansion))
+        try:
+            review = await self.acall_structured_json(
+                model=self.WEAK_TEXT_MODEL,
+                system_prompt=self.VALIDATOR_SYSTEM,
+                user_prompt=up,
+                json_schema=self.REVIEW_SCHEMA,
+                temperature=0.0,
+                seed=self.seed
+            )
+            self._validate_review(review)
+        except (fastjsonschema.JsonSchemaException, ValueError, orjson.JSONDecodeError):
+            review = await self.acall_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt=self.VALIDATOR_SYSTEM,
+                user_prompt=up,
+                json_schema=self.REVIEW_SCHEMA,
+                temperature=0.0,
+                seed=self.seed
+            )
+        return review["reviews"]
+
+    def assemble_final(self, draft: Dict[str, Any], suggestions: Any,
+                       on_facet: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
         """
         输入：
             draft: 世界观草稿（JSON 对象）
             suggestions: 审阅建议数组（每项包含 target_path / suggestion）
+            on_facet: 可选回调；终稿中每个顶层 Facet 一闭合就以 (键, 值) 触发，
+                      用于边生成边校验/展示进度，不必等整篇终稿收尾
         输出：
             revised_final: 根据建议修订后的世界观（严格为 JSON，对 FINAL_SCHEMA 做结构约束）
         说明：
@@ -122,39 +528,60 @@ class WorldviewGenerator(LLMBase):  # 继承 LLMBase
             - 优先落实：边界、代价、失败模式、可观测信号、开放问题等“可写性杠杆”。
             - 保持原有命名与结构风格，避免无必要的字段大改名。
         """
-        # 构造用于应用建议的 System 与 User 提示词
-        patcher_system = """\
-    你是一名“世界观补丁工程师”。你的任务是将审阅建议数组有序地应用到给定的世界观草稿上，产出修订版世界观。
-    必须遵守：
-    1) 仅修改“世界背景与运行规则”；严禁引入人物、情节、任务、对话等叙事要素。
-    2) 优先在 target_path 指向的位置进行就地修订
-    3) 保留原有术语与结构风格，不做无谓重命名；必要时可在原字段下增加小型子结构以承载新信息。
-    """
-
-        # 为了让模型可定位与改写，这里把 draft 和 suggestions 直接放入 user 提示
-        patcher_user = """\
-    # DRAFT
-    {draft_str}
-
-    # SUGGESTIONS
-    {suggestions_str}
-
-    # 产出要求
-    - 输出修订后的世界观（完整体，不只是差异）。
-    - 尽量减少冗余与空话，保持信息密度与可写性。
-    """.format(
-            draft_str=str(draft),
-            suggestions_str=str(suggestions)
-        )
-
-        revised_final = self.call_structured_json(
+        if isinstance(suggestions, list):
+            suggestions = suggestions[:_MAX_SUGGESTIONS]
+        patcher_user = render(self.PATCHER_USER_TEMPLATE,
+                              draft_str=_compact_json(draft),
+                              suggestions_str=_compact_json(suggestions))
+
+        # 终稿输出最长（多 Facet 全量世界观），走流式接口：
+        # 增量边生成边接收，首 token 即开始到达；挂上 on_facet 后
+        # 每个 Facet 的下游处理与其余 Facet 的生成重叠
+        scanner = ObjectEntryScanner(on_facet) if on_facet is not None else None
+        revised_final = self.call_structured_json_stream(
             model=self.STRONG_TEXT_MODEL,
-            system_prompt=patcher_system,
+            system_prompt=self.PATCHER_SYSTEM,
             user_prompt=patcher_user,
             json_schema=None,
+            scanner=scanner,
         )
         return revised_final
 
+    async def aassemble_final(self, draft: Dict[str, Any], suggestions: Any) -> Dict[str, Any]:
+        """assemble_final 的异步版本，提示词与同步路径完全一致。"""
+        if isinstance(suggestions, list):
+            suggestions = suggestions[:_MAX_SUGGESTIONS]
+        patcher_user = render(self.PATCHER_USER_TEMPLATE,
+                              draft_str=_compact_json(draft),
+                              suggestions_str=_compact_json(suggestions))
+
+        def _call():
+            return self.acall_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt=self.PATCHER_SYSTEM,
+                user_prompt=patcher_user,
+                json_schema=None,
+            )
+
+        # 终稿是全流程最长的一次生成，p99 尾延迟直接决定整条流水线的尾延迟。
+        # 这里做请求对冲：首发 2 秒未归再发一份相同请求，取先完成者、取消败者。
+        # 平均只多付极小比例的重复 token，换取尾部等待被第二份请求截断。
+        return await self._hedged(_call)
+
+    @staticmethod
+    async def _hedged(factory, delay: float = 2.0):
+        """对冲执行：先发一份，delay 秒未完成则再发一份，先到先得。"""
+        first = asyncio.ensure_future(factory())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        second = asyncio.ensure_future(factory())
+        done, pending = await asyncio.wait(
+            {first, second}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        return done.pop().result()
+
     # =======================
     # Public API
     # =======================
@@ -177,6 +604,18 @@ class WorldviewGenerator(LLMBase):  # 继承 LLMBase
         # 1.5) 获取生成建议
         advice = self.get_advice(meta)
 
+        if self.fused:
+            # 融合模式：生成+自评+修订一次往返完成
+            fused = self.generate_with_single_iteration(meta, advice)
+            self._validate_fused(fused)
+            return {
+                "meta": meta,
+                "advice": advice,
+                "draft_expansion": fused["draft_worldview"],
+                "review_suggestions": fused["issues"],
+                "final_worldview": fused["revised_worldview"]
+            }
+
         # 2) 生成草稿
         draft_expansion = self.generate_expansion(meta, advice)
 
@@ -194,6 +633,79 @@ class WorldviewGenerator(LLMBase):  # 继承 LLMBase
             "final_worldview": final_worldview
         }
 
+    async def agenerate_worldview_bestof(self, n: int = 4) -> Dict[str, Any]:
+        """best-of-N 采样：并发生成 n 份草稿候选（不同 seed），弱模型排序选优。
+        n 个生成调用经 asyncio.gather 同时在途，墙钟 ≈ 最慢的一次调用；
+        返回 best_expansion 及全部候选与打分，供 run 流程继续审阅/修订。
+        """
+        meta = self.example_meta
+        advice = await asyncio.to_thread(self.get_advice, meta)
+        up = render(self.GENERATOR_USER_TEMPLATE, advice=advice, meta=self._meta_json_for(meta))
+        base_seed = self.seed if self.seed is not None else secrets.randbits(32)
+        drafts: List[Any] = await asyncio.gather(*[
+            self.acall_structured_json(
+                model=self.STRONG_TEXT_MODEL,
+                system_prompt=self.GENERATOR_SYSTEM,
+                user_prompt=up,
+                temperature=0.95,
+                seed=base_seed + i,
+            )
+            for i in range(n)
+        ])
+        candidates = "\n\n".join(
+            f"### idx={i}\n{draft}" for i, draft in enumerate(drafts))
+        ranking = await self.acall_structured_json(
+            model=self.WEAK_TEXT_MODEL,
+            system_prompt=self.RANKER_SYSTEM,
+            user_prompt=render(self.RANKER_USER_TEMPLATE,
+                               meta=self._meta_json_for(meta), candidates=candidates),
+            json_schema=self.RANKING_SCHEMA,
+            temperature=0.0,
+            seed=self.seed,
+        )
+        rankings = ranking.get("rankings", [])
+        valid = [r for r in rankings if isinstance(r.get("idx"), int) and 0 <= r["idx"] < len(drafts)]
+        best_idx = max(valid, key=lambda r: r["score"])["idx"] if valid else 0
+        return {
+            "advice": advice,
+            "candidates": drafts,
+            "rankings": rankings,
+            "best_idx": best_idx,
+            "best_expansion": drafts[best_idx],
+        }
+
+    def generate_worldview_bestof(self, n: int = 4) -> Dict[str, Any]:
+        return asyncio.run(self.agenerate_worldview_bestof(n))
+
+    async def arun(self) -> Dict[str, Any]:
+        """run 的异步版本。本链路各步有严格数据依赖（建议→草稿→审阅→修订），
+        内部仍是顺序 await；价值在于调用方可以把多个 WorldviewGenerator
+        （或世界观与其他阶段）放进同一个 asyncio.gather 里并发执行。
+        """
+        meta = self.example_meta
+        # WritingMaster 是同步接口（带进程内缓存），丢到线程池避免阻塞事件循环
+        advice = await asyncio.to_thread(self.get_advice, meta)
+        if self.fused:
+            fused = await self.agenerate_with_single_iteration(meta, advice)
+            self._validate_fused(fused)
+            return {
+                "meta": meta,
+                "advice": advice,
+                "draft_expansion": fused["draft_worldview"],
+                "review_suggestions": fused["issues"],
+                "final_worldview": fused["revised_worldview"]
+            }
+        draft_expansion = await self.agenerate_expansion(meta, advice)
+        review_suggestions = await self.areview_and_revise(meta, draft_expansion)
+        final_worldview = await self.aassemble_final(draft_expansion, review_suggestions)
+        return {
+            "meta": meta,
+            "advice": advice,
+            "draft_expansion": draft_expansion,
+            "review_suggestions": review_suggestions,
+            "final_worldview": final_worldview
+        }
+
 # =======================
 # Example
 # =======================